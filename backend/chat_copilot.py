@@ -1,58 +1,206 @@
 import os
-from groq import Groq
+import re
+import time
+import asyncio
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
-from backend.forecasting import get_demand_forecast
-from backend.sentiment import analyze_sentiment
-from backend.recommendations import get_stock_alerts, get_pricing_suggestions
+from backend.context_snapshot import get_context_snapshot
+from backend.llm_transport import LLMUnavailable, get_transport
+from backend.tracing import stage, record_cache
 import json
 
 load_dotenv()
 
-client = None
+COPILOT_MODEL = "llama-3.3-70b-versatile"  # Latest Groq model (updated)
+COPILOT_CACHE_TTL = float(os.getenv('COPILOT_CACHE_TTL', '300'))
+COPILOT_CACHE_SIZE = int(os.getenv('COPILOT_CACHE_SIZE', '256'))
+COMPLETION_PARAMS = {'model': COPILOT_MODEL, 'temperature': 0.7, 'max_tokens': 500}
 
-def get_groq_client():
-    """Initialize Groq client"""
-    global client
-    if client is None:
-        api_key = os.getenv('GROQ_API_KEY')
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
-        client = Groq(api_key=api_key)
-    return client
+def normalize_question(question):
+    """Canonical form of a question so near-identical phrasings share answers"""
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', question.lower()).split())
 
-def get_business_context():
-    """Gather all business intelligence data"""
+class Flight:
+    """One upstream completion, shared by every caller asking the same question.
+
+    The answer's chunks are kept as they arrive, so a caller that joins
+    late replays them before following the rest live. on_done(answer) is
+    called as the completion ends, with None when it failed.
+    """
+
+    def __init__(self, chunks, on_done):
+        self.chunks = []
+        self._update = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run(chunks, on_done))
+        self.task.add_done_callback(_retrieve_error)
+
+    async def _run(self, chunks, on_done):
+        answer = None
+        try:
+            async for content in chunks:
+                self.chunks.append(content)
+                self._notify()
+            answer = ''.join(self.chunks)
+            return answer
+        finally:
+            on_done(answer)
+            self._notify()
+
+    def _notify(self):
+        self._update.set()
+        self._update = asyncio.Event()
+
+    async def follow(self):
+        """Yield the answer's chunks from the first one, raising the completion's error if it fails"""
+        sent = 0
+        while True:
+            update = self._update
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.task.done():
+                self.task.result()
+                return
+            await update.wait()
+
+def _retrieve_error(task):
+    # The error reaches every caller following the flight; none may be left
+    if not task.cancelled():
+        task.exception()
+
+async def single_chunk(compute):
+    yield await compute()
+
+class ResponseCache:
+    """TTL + LRU cache of LLM answers with single-flight request coalescing.
+
+    Concurrent callers asking the same question against the same context
+    version, streamed or not, share one upstream completion instead of
+    issuing their own.
+    """
+
+    def __init__(self, ttl=COPILOT_CACHE_TTL, max_entries=COPILOT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """Return a fresh cached answer or None, counting the lookup"""
+        with self._lock:
+            answer = self._get_locked(key)
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache('copilot_response', hits=int(answer is not None), misses=int(answer is None))
+        return answer
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        answer, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def put(self, key, answer):
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup_or_join(self, key, chunks):
+        """The cached answer for key, or the Flight computing it.
+
+        A new Flight over chunks() is started only when none is in flight.
+        It runs as its own task, so a caller that goes away does not cancel
+        it for the others waiting on the same key.
+        """
+        with self._lock:
+            answer = self._get_locked(key)
+            flight = None
+            if answer is not None:
+                self.hits += 1
+            else:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    self.misses += 1
+                    flight = self._inflight[key] = Flight(chunks(), lambda answer: self._finish(key, flight, answer))
+                else:
+                    self.coalesced += 1
+        if answer is not None:
+            record_cache('copilot_response', hits=1)
+        else:
+            record_cache('copilot_response', hits=int(not leader), misses=int(leader))
+        return answer, flight
+
+    def _finish(self, key, flight, answer):
+        if answer is not None:
+            self.put(key, answer)
+        with self._lock:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+    async def get_or_compute(self, key, compute):
+        """Return the cached answer for key, running compute() at most once concurrently"""
+        answer, flight = self._lookup_or_join(key, lambda: single_chunk(compute))
+        if flight is None:
+            return answer
+        return await asyncio.shield(flight.task)
+
+    async def get_or_stream(self, key, stream):
+        """Yield the answer for key in chunks: cached, from the completion in flight, or from a new stream()"""
+        answer, flight = self._lookup_or_join(key, stream)
+        if flight is None:
+            yield answer
+            return
+        async for content in flight.follow():
+            yield content
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+response_cache = ResponseCache()
+
+def response_cache_key(question, context):
+    """Cache key: normalized question plus the data version behind the context"""
+    return (normalize_question(question), context['snapshot_version'])
+
+async def get_business_context():
+    """Gather all business intelligence data from the precomputed snapshot"""
     try:
-        forecast_data = get_demand_forecast()
-        stock_data = get_stock_alerts()
-        sentiment_data = analyze_sentiment()
-        pricing_data = get_pricing_suggestions()
-        
-        context = {
-            'forecast': forecast_data,
-            'inventory': stock_data,
-            'sentiment': sentiment_data,
-            'pricing': pricing_data
-        }
-        
-        return context
+        with stage('business_context'):
+            context, age, version = await get_context_snapshot()
+        return dict(context, snapshot_age_seconds=age, snapshot_version=version)
     except Exception as e:
         return {'error': str(e)}
 
-def chat_with_copilot(question: str):
-    """AI copilot chat interface"""
-    try:
-        # Get business context
-        context = get_business_context()
-        
-        if 'error' in context:
-            return {
-                'answer': f"I'm having trouble accessing the data: {context['error']}",
-                'action_items': []
-            }
-        
-        # Build context summary for LLM
-        context_summary = f"""
+def build_context_summary(context):
+    """Build the system prompt describing the current business data"""
+    return f"""
 You are MarketMind AI, a retail intelligence assistant. Answer questions using the following business data:
 
 DEMAND FORECAST:
@@ -74,39 +222,92 @@ PRICING INSIGHTS:
 
 Answer the user's question with specific data and actionable recommendations.
 """
+
+def build_messages(question, context):
+    """Chat messages sent to the LLM for a question"""
+    return [
+        {"role": "system", "content": build_context_summary(context)},
+        {"role": "user", "content": question}
+    ]
+
+def extract_action_items(question, context):
+    """Extract action items (simple keyword matching)"""
+    action_items = []
+    if any(word in question.lower() for word in ['restock', 'inventory', 'stock']):
+        high_risk = [a for a in context['inventory']['alerts'] if a['risk_level'] == 'HIGH']
+        action_items = [f"Reorder {a['reorder_qty']} units of {a['product']}" for a in high_risk[:3]]
+    
+    if any(word in question.lower() for word in ['complaint', 'issue', 'problem']):
+        action_items.extend([f"Address {i['issue']} issues" for i in context['sentiment']['top_issues'][:2]])
+    
+    return action_items
+
+def summarize_context_used(context):
+    """Describe how much business data backed an answer"""
+    return {
+        'forecast_products': len(context['forecast']['rising_products']),
+        'inventory_alerts': context['inventory']['critical_count'],
+        'reviews_analyzed': context['sentiment']['overall_sentiment']['total_reviews']
+    }
+
+def data_only_answer(context):
+    """Answer straight from the business context, used when the LLM is unavailable"""
+    high_risk = [a for a in context['inventory']['alerts'] if a['risk_level'] == 'HIGH']
+    rising = ', '.join(f"{p['product']} (+{p['growth_rate']}%)" for p in context['forecast']['rising_products'])
+    reorders = ', '.join(f"{a['reorder_qty']} units of {a['product']}" for a in high_risk[:3])
+    issues = ', '.join(f"{i['issue']} ({i['count']} mentions)" for i in context['sentiment']['top_issues'][:3])
+    repriced = len([s for s in context['pricing']['suggestions'] if s['potential_change'] != 0])
+    lines = [
+        "The AI assistant is unavailable right now, so here are the key figures from the latest data:",
+        f"- Demand: rising products are {rising or 'none'}.",
+        f"- Inventory: {context['inventory']['critical_count']} critical and "
+        f"{context['inventory']['warning_count']} warning stock alerts."
+        + (f" Reorder {reorders}." if reorders else ""),
+        f"- Sentiment: {context['sentiment']['overall_sentiment']['positive']} positive and "
+        f"{context['sentiment']['overall_sentiment']['negative']} negative reviews."
+        + (f" Top issues: {issues}." if issues else ""),
+        f"- Pricing: {repriced} products need a price adjustment."
+    ]
+    return '\n'.join(lines)
+
+async def chat_with_copilot(question: str):
+    """AI copilot chat interface.
+
+    When the LLM cannot answer in time (rate limits, outages, open circuit
+    breaker), the answer is built from the business data instead and
+    'source' is 'data' rather than 'llm'.
+    """
+    try:
+        # Get business context
+        context = await get_business_context()
         
-        # Call Groq API
-        ai_client = get_groq_client()
-        response = ai_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Latest Groq model (updated)
-            messages=[
-                {"role": "system", "content": context_summary},
-                {"role": "user", "content": question}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        answer = response.choices[0].message.content
+        if 'error' in context:
+            return {
+                'answer': f"I'm having trouble accessing the data: {context['error']}",
+                'action_items': []
+            }
         
-        # Extract action items (simple keyword matching)
-        action_items = []
-        if any(word in question.lower() for word in ['restock', 'inventory', 'stock']):
-            high_risk = [a for a in context['inventory']['alerts'] if a['risk_level'] == 'HIGH']
-            action_items = [f"Reorder {a['reorder_qty']} units of {a['product']}" for a in high_risk[:3]]
+        async def complete():
+            with stage('llm_call'):
+                return await get_transport().complete(build_messages(question, context), **COMPLETION_PARAMS)
         
-        if any(word in question.lower() for word in ['complaint', 'issue', 'problem']):
-            action_items.extend([f"Address {i['issue']} issues" for i in context['sentiment']['top_issues'][:2]])
+        llm_error = None
+        try:
+            answer = await response_cache.get_or_compute(response_cache_key(question, context), complete)
+        except LLMUnavailable as e:
+            answer = data_only_answer(context)
+            llm_error = str(e)
         
-        return {
+        result = {
             'answer': answer,
-            'action_items': action_items,
-            'context_used': {
-                'forecast_products': len(context['forecast']['rising_products']),
-                'inventory_alerts': context['inventory']['critical_count'],
-                'reviews_analyzed': context['sentiment']['overall_sentiment']['total_reviews']
-            }
+            'source': 'llm' if llm_error is None else 'data',
+            'action_items': extract_action_items(question, context),
+            'context_used': summarize_context_used(context),
+            'context_age_seconds': round(context['snapshot_age_seconds'], 1)
         }
+        if llm_error is not None:
+            result['llm_error'] = llm_error
+        return result
     
     except Exception as e:
         return {
@@ -114,3 +315,47 @@ Answer the user's question with specific data and actionable recommendations.
             'action_items': [],
             'error': str(e)
         }
+
+async def stream_copilot(question: str):
+    """Streaming variant of chat_with_copilot.
+
+    Yields a 'meta' event with the action items and context usage as soon
+    as the business context is available, then one 'token' event per
+    answer chunk from the LLM, and finally a 'done' (or 'error') event
+    carrying the answer's source. If the LLM is unavailable before any
+    token was sent, the data-only answer is sent as a single token.
+    """
+    context = await get_business_context()
+    if 'error' in context:
+        yield {'type': 'error', 'error': f"I'm having trouble accessing the data: {context['error']}"}
+        return
+    
+    yield {
+        'type': 'meta',
+        'action_items': extract_action_items(question, context),
+        'context_used': summarize_context_used(context),
+        'context_age_seconds': round(context['snapshot_age_seconds'], 1)
+    }
+    
+    cache_key = response_cache_key(question, context)
+    messages = build_messages(question, context)
+    chunks = []
+    try:
+        with stage('llm_call'):
+            answer = response_cache.get_or_stream(
+                cache_key, lambda: get_transport().stream(messages, **COMPLETION_PARAMS))
+            async for content in answer:
+                chunks.append(content)
+                yield {'type': 'token', 'content': content}
+    except LLMUnavailable as e:
+        if chunks:
+            yield {'type': 'error', 'error': f"I encountered an error: {str(e)}."}
+            return
+        yield {'type': 'token', 'content': data_only_answer(context)}
+        yield {'type': 'done', 'source': 'data', 'llm_error': str(e)}
+        return
+    except Exception as e:
+        yield {'type': 'error', 'error': f"I encountered an error: {str(e)}. Please make sure your GROQ_API_KEY is configured."}
+        return
+    
+    yield {'type': 'done', 'source': 'llm'}
@@ -0,0 +1,119 @@
+"""Optional Parquet storage backend for the retail datasets.
+
+Convert the CSVs once with:
+
+    python -m backend.columnar convert
+
+then start the API with MARKETMIND_STORAGE=parquet. Re-run the conversion
+whenever the CSV sources change; until then, a dataset whose CSV is newer
+than its Parquet copy is read from the CSV.
+
+Cached datasets are written sorted by product (then date) in small row
+groups, so a product filter skips the row groups that cannot match. Each
+row keeps its CSV row number in ROW_COLUMN, and reads restore file order.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from backend.data_store import DATASETS, csv_path, columnar_path, load_csv, list_stores
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+ROW_GROUP_SIZE = 64 * 1024
+# Source CSV row number of each row in a product-sorted file
+ROW_COLUMN = '_row'
+
+def require_pyarrow():
+    """Fail with an actionable message when pyarrow is missing"""
+    if pq is None:
+        raise ImportError("Parquet storage requires pyarrow: pip install pyarrow")
+
+def build_filters(date_range=None, products=None):
+    """Translate a date range and product subset into Parquet filters"""
+    filters = []
+    if date_range is not None:
+        start, end = date_range
+        if start is not None:
+            filters.append(('date', '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append(('date', '<=', pd.Timestamp(end)))
+    if products is not None:
+        filters.append(('product', 'in', list(products)))
+    return filters or None
+
+def data_columns(schema, columns=None):
+    """Requested columns, or every column but ROW_COLUMN"""
+    return list(columns) if columns is not None else [name for name in schema.names if name != ROW_COLUMN]
+
+def read_columnar(path, columns=None, date_range=None, products=None):
+    """Memory-mapped Parquet read with column pruning and predicate pushdown, in CSV row order"""
+    require_pyarrow()
+    schema = pq.read_schema(path)
+    columns = data_columns(schema, columns)
+    if products is not None and not list(products):
+        return schema.empty_table().select(columns).to_pandas()
+    ordered = ROW_COLUMN in schema.names
+    table = pq.read_table(path, columns=columns + [ROW_COLUMN] if ordered else columns,
+                          filters=build_filters(date_range, products), memory_map=True)
+    if ordered:
+        table = table.sort_by(ROW_COLUMN).select(columns)
+    return table.to_pandas()
+
+def iter_columnar(path, chunk_rows, columns=None, products=None):
+    """Yield a Parquet file as frames of at most chunk_rows rows"""
+    require_pyarrow()
+    parquet = pq.ParquetFile(path, memory_map=True)
+    columns = data_columns(parquet.schema_arrow, columns)
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        chunk = batch.to_pandas()
+        if products is not None:
+            chunk = chunk[chunk['product'].isin(list(products)).to_numpy()]
+        if len(chunk):
+            yield chunk
+
+def cluster_by_product(df):
+    """Rows sorted by product (then date), numbered with their CSV row in ROW_COLUMN"""
+    keys = ['product'] + (['date'] if 'date' in df.columns else [])
+    return df.assign(**{ROW_COLUMN: np.arange(len(df))}).sort_values(keys, kind='stable')
+
+def convert_to_columnar(names=None, row_group_size=ROW_GROUP_SIZE):
+    """Write a Parquet copy of each CSV dataset (or of each of its store shards) next to it.
+
+    Streamed datasets are read front to back in chunks, never filtered by
+    a pushed-down predicate, so they keep their CSV order.
+    """
+    require_pyarrow()
+    written = []
+    stores = list_stores()
+    for name in names or list(DATASETS):
+        for store in (stores if DATASETS[name].get('sharded') else []) or [None]:
+            df = load_csv(csv_path(name, store), DATASETS[name])
+            if not DATASETS[name].get('streamed'):
+                df = cluster_by_product(df)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            pq.write_table(table, columnar_path(name, store), row_group_size=row_group_size)
+            written.append((name, columnar_path(name, store), len(df)))
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage columnar copies of the retail datasets")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert = subparsers.add_parser('convert', help="Convert CSV datasets to Parquet")
+    convert.add_argument('datasets', nargs='*', help=f"Datasets to convert: {', '.join(DATASETS)} (default: all)")
+    convert.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        unknown = [name for name in args.datasets if name not in DATASETS]
+        if unknown:
+            parser.error(f"unknown datasets: {', '.join(unknown)}")
+        for name, path, rows in convert_to_columnar(args.datasets or None, args.row_group_size):
+            print(f"{name}: {rows} rows -> {path}")
+
+if __name__ == '__main__':
+    main()
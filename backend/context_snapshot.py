@@ -0,0 +1,59 @@
+import asyncio
+import time
+from backend.data_store import dataset_version
+from backend.executors import run_cpu, run_io
+from backend.tracing import stage, record_cache
+from backend.sentiment import analyze_sentiment
+from backend.shards import demand_forecast, stock_alerts, pricing_suggestions
+
+# Latest materialized business context, shared by all copilot requests
+_snapshot = None
+_refresh_task = None
+
+async def build_business_context():
+    """Run every analytics pipeline in parallel CPU workers and collect the results"""
+    with stage('context_build'):
+        forecast, inventory, sentiment, pricing = await asyncio.gather(
+            demand_forecast(), stock_alerts(), run_cpu(analyze_sentiment), pricing_suggestions())
+    return {'forecast': forecast, 'inventory': inventory, 'sentiment': sentiment, 'pricing': pricing}
+
+async def _refresh(version):
+    global _snapshot
+    context = await build_business_context()
+    _snapshot = {'version': version, 'context': context, 'built_at': time.time()}
+    return _snapshot
+
+def _retrieve_error(task):
+    # Keep serving the previous snapshot; the next read retries
+    if not task.cancelled():
+        task.exception()
+
+def _start_refresh(version):
+    """Start a snapshot build unless one is already running"""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.ensure_future(_refresh(version))
+        _refresh_task.add_done_callback(_retrieve_error)
+    return _refresh_task
+
+async def get_context_snapshot():
+    """Return the latest business-context snapshot, its age in seconds and its data version.
+
+    The snapshot is built in CPU pool workers. The first call waits for that
+    build; afterwards reads never wait on analytics: when an input file
+    changed, the stale snapshot is returned while a single rebuild runs.
+    """
+    version = await run_io(dataset_version)
+    snapshot = _snapshot
+    record_cache('context_snapshot', hits=int(snapshot is not None and snapshot['version'] == version),
+                 misses=int(snapshot is None or snapshot['version'] != version))
+    if snapshot is None:
+        snapshot = await asyncio.shield(_start_refresh(version))
+    elif snapshot['version'] != version:
+        _start_refresh(version)
+    return snapshot['context'], time.time() - snapshot['built_at'], snapshot['version']
+
+def invalidate_snapshot():
+    """Forget the current snapshot so the next read rebuilds it"""
+    global _snapshot
+    _snapshot = None
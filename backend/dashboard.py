@@ -0,0 +1,137 @@
+import os
+import asyncio
+import hashlib
+from backend.data_store import dataset_version
+from backend.executors import run_cpu, run_io
+from backend.forecasting import forecast_bundle, merge_demand_forecasts, merge_forecast_summaries
+from backend.recommendations import store_stock_alerts, merge_stock_alerts, format_stock_alerts, get_pricing_suggestions
+from backend.sentiment import analyze_sentiment
+from backend.shards import for_each_store
+from backend.query import QueryError
+
+SECTIONS = ('forecast', 'stock_alerts', 'sentiment', 'pricing_suggestions')
+FORECAST_SECTIONS = {'forecast', 'stock_alerts', 'pricing_suggestions'}
+# Times a non-streamed dashboard is recomputed when its input files change mid-request
+DASHBOARD_ATTEMPTS = int(os.getenv('MARKETMIND_DASHBOARD_ATTEMPTS', '3'))
+
+class DataChangedError(Exception):
+    """An input file changed while a dashboard section was being computed"""
+
+def parse_sections(sections):
+    """Requested section names in canonical order (all of them when none are given)"""
+    if not sections:
+        return list(SECTIONS)
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        raise QueryError(f"Unknown section: {', '.join(sorted(unknown))}. Expected: {', '.join(SECTIONS)}")
+    return [section for section in SECTIONS if section in sections]
+
+def data_version_tag(versions):
+    """Short digest of a set of input file versions"""
+    return hashlib.sha256(repr(versions).encode()).hexdigest()[:16]
+
+def check_versions(versions, names):
+    """Raise DataChangedError unless the named datasets still have their pinned versions"""
+    pinned = tuple(entry for entry in versions if entry[0] in names)
+    if dataset_version(names) != pinned:
+        raise DataChangedError(f"Input data changed while computing the dashboard: {', '.join(names)}")
+
+def pinned_call(versions, names, func, *args, **kwargs):
+    """Call func, checking the datasets it reads against the pinned versions before and after"""
+    check_versions(versions, names)
+    result = func(*args, **kwargs)
+    check_versions(versions, names)
+    return result
+
+async def forecast_bundles(versions, products=None):
+    """Per-store (or unsharded) forecast bodies and summaries, one forecast pass each, in parallel workers"""
+    return await for_each_store(pinned_call, versions, ['sales'], forecast_bundle, products)
+
+async def forecast_section(bundles):
+    stores, results = await bundles
+    if stores == [None]:
+        return results[0][0]
+    return merge_demand_forecasts(stores, [forecast for forecast, _ in results])
+
+async def stock_alerts_section(bundles, versions, products):
+    stores, results = await bundles
+    frames = await asyncio.gather(*(
+        run_cpu(pinned_call, versions, ['sales', 'inventory'], store_stock_alerts, products, None, store, summary)
+        for store, (_, summary) in zip(stores, results)))
+    if stores == [None]:
+        return format_stock_alerts(frames[0])
+    return format_stock_alerts(merge_stock_alerts(frames), chain=True)
+
+async def pricing_section(bundles, versions, products):
+    stores, results = await bundles
+    summary = merge_forecast_summaries([summary for _, summary in results])
+    return await run_cpu(pinned_call, versions, ['sales', 'pricing'], get_pricing_suggestions,
+                         products=products, forecast_summary=summary)
+
+async def _labelled(section, coroutine):
+    try:
+        return section, await coroutine, None
+    except Exception as e:
+        return section, None, e
+
+async def dashboard_sections(sections, versions, products=None):
+    """Yield (section, result, error) as each requested section finishes.
+
+    The forecast runs once per store and its summary is shared by the
+    stock-alert and pricing sections; sentiment runs alongside it. Every
+    worker checks that the files it reads still have the pinned versions,
+    so a section computed from other data fails with DataChangedError.
+    """
+    bundles = asyncio.ensure_future(forecast_bundles(versions, products)) if FORECAST_SECTIONS & set(sections) else None
+    builders = {
+        'forecast': lambda: forecast_section(bundles),
+        'stock_alerts': lambda: stock_alerts_section(bundles, versions, products),
+        'sentiment': lambda: run_cpu(pinned_call, versions, ['reviews'], analyze_sentiment, products=products),
+        'pricing_suggestions': lambda: pricing_section(bundles, versions, products)
+    }
+    tasks = [asyncio.ensure_future(_labelled(section, builders[section]())) for section in sections]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        if bundles is not None:
+            bundles.cancel()
+
+async def get_dashboard(sections, products=None):
+    """All requested sections in one payload, plus the data version they were all computed from.
+
+    Input file versions are pinned once per attempt; when a file changes
+    mid-request, the whole dashboard is recomputed, up to
+    DASHBOARD_ATTEMPTS times.
+    """
+    for _ in range(DASHBOARD_ATTEMPTS):
+        versions = await run_io(dataset_version)
+        result = {'data_version': data_version_tag(versions), 'sections': {}, 'errors': {}}
+        changed = False
+        async for section, data, error in dashboard_sections(sections, versions, products):
+            if error is not None:
+                result['errors'][section] = str(error)
+                changed = changed or isinstance(error, DataChangedError)
+            else:
+                result['sections'][section] = data
+        if not changed:
+            break
+    result['sections'] = {section: result['sections'][section] for section in sections if section in result['sections']}
+    return result
+
+async def dashboard_events(sections, products=None):
+    """Stream events: meta first, then one per section as soon as it is ready, then done.
+
+    Sections already sent cannot be recomputed, so one whose input files
+    changed after the meta event is reported as an error event instead.
+    """
+    versions = await run_io(dataset_version)
+    yield {'type': 'meta', 'sections': sections, 'data_version': data_version_tag(versions)}
+    async for section, data, error in dashboard_sections(sections, versions, products):
+        if error is not None:
+            yield {'type': 'error', 'section': section, 'detail': str(error)}
+        else:
+            yield {'type': 'section', 'section': section, 'data': data}
+    yield {'type': 'done'}
@@ -0,0 +1,248 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from backend.tracing import stage, record_cache
+
+# Process-wide dataset cache shared by all loaders
+DATA_DIR = os.getenv('MARKETMIND_DATA_DIR', 'data')
+CACHE_DIR = os.getenv('MARKETMIND_CACHE_DIR', '.cache')
+MAX_CACHE_BYTES = int(float(os.getenv('MARKETMIND_DATA_CACHE_MB', '512')) * 1024 * 1024)
+STORAGE_BACKEND = os.getenv('MARKETMIND_STORAGE', 'csv')  # 'csv' or 'parquet'
+# Per-store shards of the sharded datasets live in <data dir>/stores/<store_id>/
+STORES_DIR = 'stores'
+
+DATASETS = {
+    'sales': {
+        'file': 'sales.csv',
+        'dtype': {'product': 'category', 'units_sold': 'int64'},
+        'parse_dates': ['date'],
+        'sharded': True
+    },
+    'inventory': {
+        'file': 'inventory.csv',
+        'dtype': {'product': 'category', 'stock_left': 'int64', 'warehouse_id': 'category'},
+        'sharded': True
+    },
+    'pricing': {
+        'file': 'pricing.csv',
+        'dtype': {'product': 'category', 'current_price': 'float64', 'competitor_price': 'float64'}
+    },
+    'reviews': {
+        'file': 'reviews.csv',
+        'dtype': {'product': 'category'},
+        # Read in chunks by the sentiment pipeline rather than held in the cache
+        'streamed': True
+    }
+}
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+_path_locks = {}
+cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def store_dir(store):
+    """Directory holding one store's shards"""
+    return os.path.join(DATA_DIR, STORES_DIR, str(store))
+
+def list_stores():
+    """Store ids with a sales shard on disk, sorted; empty when the data is not sharded"""
+    root = os.path.join(DATA_DIR, STORES_DIR)
+    if not os.path.isdir(root):
+        return []
+    return sorted(store for store in os.listdir(root)
+                  if os.path.exists(os.path.join(root, store, DATASETS['sales']['file'])))
+
+def _base_dir(name, store):
+    if store is None:
+        return DATA_DIR
+    if not DATASETS[name].get('sharded'):
+        raise ValueError(f"Dataset '{name}' is not sharded by store")
+    return store_dir(store)
+
+def csv_path(name, store=None):
+    """Path of the CSV source of a named dataset (or of one store's shard)"""
+    return os.path.join(_base_dir(name, store), DATASETS[name]['file'])
+
+def columnar_path(name, store=None):
+    """Path of the Parquet copy of a named dataset (or of one store's shard)"""
+    return os.path.join(_base_dir(name, store), f"{name}.parquet")
+
+def dataset_path(name, store=None):
+    """Resolve the on-disk path of a named dataset for the active storage backend.
+
+    A Parquet copy older than its CSV is stale, so the CSV is read until
+    the dataset is converted again.
+    """
+    source = csv_path(name, store)
+    if STORAGE_BACKEND == 'parquet':
+        path = columnar_path(name, store)
+        if os.path.exists(path) and not (
+                os.path.exists(source) and os.stat(source).st_mtime_ns > os.stat(path).st_mtime_ns):
+            return path
+    return source
+
+def file_signature(path):
+    """Identify a file version by its modification time and size"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def dataset_version(names=None):
+    """Current signatures of the given datasets, usable as a cache key.
+
+    Sharded datasets contribute one signature per store shard.
+    """
+    names = names or list(DATASETS)
+    stores = list_stores()
+    version = []
+    for name in names:
+        if stores and DATASETS[name].get('sharded'):
+            version.extend((name, store, file_signature(dataset_path(name, store))) for store in stores)
+        else:
+            version.append((name, file_signature(dataset_path(name))))
+    return tuple(version)
+
+def _read_csv(path, spec):
+    return pd.read_csv(path, dtype=spec.get('dtype'), parse_dates=spec.get('parse_dates') or False)
+
+def _path_lock(path):
+    # One lock per file rather than per cached query, so the table stays as small as the data directory
+    with _cache_lock:
+        lock = _path_locks.get(path)
+        if lock is None:
+            lock = _path_locks[path] = threading.Lock()
+        return lock
+
+def _store(key, signature, df):
+    global _cache_bytes
+    nbytes = int(df.memory_usage(deep=True).sum())
+    with _cache_lock:
+        previous = _cache.pop(key, None)
+        if previous is not None:
+            _cache_bytes -= previous[2]
+        _cache[key] = (signature, df, nbytes)
+        _cache_bytes += nbytes
+        # Evict least recently used datasets, but always keep the newest one
+        while _cache_bytes > MAX_CACHE_BYTES and len(_cache) > 1:
+            _, (_, _, evicted_bytes) = _cache.popitem(last=False)
+            _cache_bytes -= evicted_bytes
+            cache_stats['evictions'] += 1
+
+def _lookup(key, signature):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == signature:
+            _cache.move_to_end(key)
+            cache_stats['hits'] += 1
+            return entry[1]
+    return None
+
+def _load_cached(path, query, read):
+    """Serve (path, query) from the cache, calling read() once per file version.
+
+    Concurrent callers that see the same stale file share a single reload.
+    """
+    key = (path, query)
+    signature = file_signature(path)
+    df = _lookup(key, signature)
+    if df is not None:
+        record_cache('dataset', hits=1)
+        return df
+
+    with _path_lock(path):
+        signature = file_signature(path)
+        df = _lookup(key, signature)
+        if df is not None:
+            record_cache('dataset', hits=1)
+            return df
+        with stage(f"load_{os.path.splitext(os.path.basename(path))[0]}"):
+            df = read()
+        with _cache_lock:
+            cache_stats['misses'] += 1
+        record_cache('dataset', misses=1)
+        _store(key, signature, df)
+        return df
+
+def load_csv(path, spec=None):
+    """Load a CSV through the cache, re-reading only when mtime or size change.
+
+    The returned frame is shared between callers and must be treated as
+    read-only.
+    """
+    spec = spec or {}
+    return _load_cached(path, None, lambda: _read_csv(path, spec))
+
+def filter_frame(df, columns=None, date_range=None, products=None):
+    """Apply column projection, a [start, end] date range and a product subset"""
+    mask = None
+    if date_range is not None:
+        start, end = date_range
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df['date'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= df['date'] <= pd.Timestamp(end)
+    if products is not None:
+        in_products = df['product'].isin(list(products))
+        mask = in_products if mask is None else mask & in_products
+    if mask is not None:
+        df = df[mask.to_numpy()]
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+def load_dataset(name, columns=None, date_range=None, products=None, store=None):
+    """Load one of the named retail datasets, or a single store's shard of it.
+
+    With MARKETMIND_STORAGE=parquet and a converted file present, the
+    projection and filters are pushed down into a memory-mapped Parquet
+    read; otherwise they are applied to the cached CSV frame. A store
+    scoped load only ever reads that store's shard.
+    """
+    path = dataset_path(name, store)
+    if path.endswith('.parquet'):
+        from backend.columnar import read_columnar
+        query = (
+            tuple(columns) if columns is not None else None,
+            tuple(date_range) if date_range is not None else None,
+            tuple(sorted(products)) if products is not None else None
+        )
+        return _load_cached(path, query,
+                            lambda: read_columnar(path, columns, date_range, products))
+
+    df = load_csv(path, DATASETS[name])
+    if columns is not None and list(columns) == list(df.columns):
+        columns = None
+    if columns is None and date_range is None and products is None:
+        return df
+    return filter_frame(df, columns, date_range, products)
+
+def iter_dataset(name, chunk_rows, columns=None, products=None):
+    """Yield a dataset as frames of at most chunk_rows rows, bypassing the cache.
+
+    Only one chunk is in memory at a time, so this suits files too large
+    to load whole. Chunks left empty by the product filter are skipped.
+    """
+    path = dataset_path(name)
+    if path.endswith('.parquet'):
+        from backend.columnar import iter_columnar
+        yield from iter_columnar(path, chunk_rows, columns, products)
+        return
+
+    spec = DATASETS[name]
+    parse_dates = [c for c in spec.get('parse_dates') or [] if columns is None or c in columns]
+    with pd.read_csv(path, dtype=spec.get('dtype'), parse_dates=parse_dates or False,
+                     usecols=list(columns) if columns is not None else None, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            if products is not None:
+                chunk = filter_frame(chunk, products=products)
+            if len(chunk):
+                yield chunk
+
+def clear_cache():
+    """Drop every cached dataset"""
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
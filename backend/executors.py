@@ -0,0 +1,82 @@
+import os
+import asyncio
+import functools
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from backend.tracing import start_trace, merge_trace, profile_samples, profiled_thread, SamplingProfiler
+
+# Separate pools so slow LLM calls cannot starve analytics and vice versa
+CPU_WORKERS = int(os.getenv('MARKETMIND_CPU_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+IO_WORKERS = int(os.getenv('MARKETMIND_IO_WORKERS', '16'))
+# 'spawn' or 'forkserver': workers must not be forked from this multi-threaded process,
+# or they can inherit locks held by another thread that nothing will ever release
+CPU_START_METHOD = os.getenv('MARKETMIND_CPU_START_METHOD', 'spawn')
+
+_cpu_pool = None
+_io_pool = None
+_pools_lock = threading.Lock()
+
+def get_cpu_pool():
+    """Process pool for CPU-bound analytics (forecasting, model inference), created once"""
+    global _cpu_pool
+    with _pools_lock:
+        if _cpu_pool is None:
+            from backend.warmup import WARMUP_ENABLED, warm_worker
+            _cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS,
+                                            mp_context=multiprocessing.get_context(CPU_START_METHOD),
+                                            initializer=warm_worker if WARMUP_ENABLED else None)
+        return _cpu_pool
+
+def get_io_pool():
+    """Bounded thread pool for blocking I/O such as LLM calls"""
+    global _io_pool
+    with _pools_lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='marketmind-io')
+        return _io_pool
+
+def _call_traced(func, args, kwargs, profile):
+    """Run func in a worker process, returning its result with the worker's trace"""
+    with start_trace() as trace:
+        if profile:
+            with SamplingProfiler({threading.get_ident()}) as profiler:
+                result = func(*args, **kwargs)
+            samples = profiler.collapsed()
+        else:
+            result = func(*args, **kwargs)
+            samples = None
+    return result, trace.export(), samples
+
+async def run_cpu(func, *args, **kwargs):
+    """Run a picklable, module-level function in the CPU process pool"""
+    loop = asyncio.get_running_loop()
+    samples = profile_samples()
+    result, trace, worker_samples = await loop.run_in_executor(
+        get_cpu_pool(), functools.partial(_call_traced, func, args, kwargs, samples is not None))
+    merge_trace(trace)
+    for stack, count in (worker_samples or {}).items():
+        samples[f"cpu-worker;{stack}"] += count
+    return result
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking I/O function in the I/O thread pool, keeping the request context"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_io_pool(), functools.partial(context.run, _call_io, func, args, kwargs))
+
+def _call_io(func, args, kwargs):
+    with profiled_thread():
+        return func(*args, **kwargs)
+
+def shutdown_pools():
+    """Stop both pools, e.g. on application shutdown"""
+    global _cpu_pool, _io_pool
+    with _pools_lock:
+        if _cpu_pool is not None:
+            _cpu_pool.shutdown(wait=False, cancel_futures=True)
+            _cpu_pool = None
+        if _io_pool is not None:
+            _io_pool.shutdown(wait=False, cancel_futures=True)
+            _io_pool = None
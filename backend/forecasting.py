@@ -1,27 +1,48 @@
+import os
+import io
+import time
+import hashlib
+import threading
+import multiprocessing
+from collections import deque
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from backend.data_store import load_dataset, load_csv, csv_path, list_stores, DATASETS, CACHE_DIR
+from backend.query import paginate
+from backend.tracing import traced
 
-def load_sales_data():
-    """Load sales data from CSV"""
-    df = pd.read_csv('data/sales.csv')
-    df['date'] = pd.to_datetime(df['date'])
-    return df
+FORECAST_INCREMENTAL = os.getenv('FORECAST_INCREMENTAL', '0') == '1'
+FORECAST_MODEL = os.getenv('FORECAST_MODEL', 'sma')  # 'sma' or 'prophet'
+# Fit processes per forecasting process; 0 splits the cores evenly across the CPU pool workers
+PROPHET_WORKERS = int(os.getenv('PROPHET_WORKERS', '0'))
+PROPHET_CHUNK_SIZE = int(os.getenv('PROPHET_CHUNK_SIZE', '25'))
+# Overall time budget for one forecast's fits; unfinished products use SMA
+PROPHET_DEADLINE = float(os.getenv('PROPHET_DEADLINE', '120'))
+PROPHET_CACHE_DIR = os.path.join(CACHE_DIR, 'prophet')
+SALES_COLUMNS = ['date', 'product', 'units_sold']
+
+def load_sales_data(date_range=None, products=None, store=None):
+    """Load sales data (cached until the file changes), optionally filtered by date range and products
+
+    With a store, only that store's shard is read.
+    """
+    return load_dataset('sales', columns=SALES_COLUMNS, date_range=date_range, products=products, store=store)
 
 def simple_moving_average_forecast(df, product, days=7, window=7):
     """Simple moving average forecast for hackathon speed"""
     product_data = df[df['product'] == product].sort_values('date')
-    
+
     if len(product_data) < window:
         return None
-    
+
     recent_avg = product_data['units_sold'].tail(window).mean()
-    trend = (product_data['units_sold'].tail(3).mean() - 
+    trend = (product_data['units_sold'].tail(3).mean() -
              product_data['units_sold'].head(3).mean()) / len(product_data)
-    
+
     forecasts = []
     last_date = product_data['date'].max()
-    
+
     for i in range(1, days + 1):
         forecast_date = last_date + timedelta(days=i)
         forecast_value = recent_avg + (trend * i)
@@ -30,57 +51,489 @@ def simple_moving_average_forecast(df, product, days=7, window=7):
             'product': product,
             'forecasted_units': max(0, int(forecast_value))
         })
-    
+
     return forecasts
 
-def get_demand_forecast():
-    """Get 7-day forecast for all products"""
-    df = load_sales_data()
-    products = df['product'].unique()
-    
-    all_forecasts = []
-    rising_products = []
-    
-    for product in products:
-        forecast = simple_moving_average_forecast(df, product)
-        if forecast:
-            all_forecasts.extend(forecast)
-            
-            # Calculate growth rate
-            product_data = df[df['product'] == product]
-            recent_avg = product_data['units_sold'].tail(7).mean()
-            older_avg = product_data['units_sold'].head(7).mean()
-            growth_rate = ((recent_avg - older_avg) / older_avg * 100) if older_avg > 0 else 0
-            
-            if growth_rate > 10:
-                rising_products.append({
-                    'product': product,
-                    'growth_rate': round(growth_rate, 2),
-                    'avg_daily_demand': int(recent_avg)
-                })
-    
+def compute_product_stats(df, window=7, growth_window=7):
+    """Per-product demand statistics for every product in one vectorized pass.
+
+    Sorts the sales history once by (product, date) and derives the moving
+    average, head/tail trend and growth rate for all products with NumPy
+    segment sums, instead of filtering and sorting the frame per product.
+    Products keep their order of first appearance, like ``df['product'].unique()``.
+    """
+    codes, products = pd.factorize(df['product'], sort=False)
+    valid = codes >= 0
+    codes = codes[valid]
+    units = df['units_sold'].to_numpy(dtype=float)[valid]
+    dates = df['date'].to_numpy()[valid]
+
+    # Stable sort by product, then date
+    order = np.lexsort((dates, codes))
+    codes = codes[order]
+    units = units[order]
+    dates = dates[order]
+
+    n_products = len(products)
+    counts = np.bincount(codes, minlength=n_products)
+    starts = np.cumsum(counts) - counts
+    position = np.arange(len(codes)) - starts[codes]
+    from_end = counts[codes] - position
+
+    def segment_mean(mask, size):
+        sums = np.bincount(codes[mask], weights=units[mask], minlength=n_products)
+        return sums / np.maximum(np.minimum(counts, size), 1)
+
+    recent_avg = segment_mean(from_end <= window, window)
+    trend = (segment_mean(from_end <= 3, 3) - segment_mean(position < 3, 3)) / np.maximum(counts, 1)
+    growth_recent = segment_mean(from_end <= growth_window, growth_window)
+    growth_older = segment_mean(position < growth_window, growth_window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth_rate = np.where(growth_older > 0,
+                               (growth_recent - growth_older) / growth_older * 100, 0.0)
+
+    last_date = np.full(n_products, np.datetime64('NaT'), dtype=dates.dtype)
+    has_rows = counts > 0
+    last_date[has_rows] = dates[(starts + counts - 1)[has_rows]]
+
+    return pd.DataFrame({
+        'product': np.asarray(products, dtype=object),
+        'observations': counts,
+        'recent_avg': recent_avg,
+        'trend': trend,
+        'growth_rate': growth_rate,
+        'growth_recent_avg': growth_recent,
+        'last_date': last_date
+    })
+
+def build_forecasts(stats, days=7, window=7):
+    """Expand product stats into a long frame of daily forecasts"""
+    stats = stats[stats['observations'] >= window]
+    steps = np.arange(1, days + 1)
+
+    values = stats['recent_avg'].to_numpy()[:, None] + stats['trend'].to_numpy()[:, None] * steps
+    units = np.maximum(0, np.trunc(values)).astype(np.int64)
+    dates = stats['last_date'].to_numpy()[:, None] + steps.astype('timedelta64[D]')
+
+    return pd.DataFrame({
+        'date': pd.DatetimeIndex(dates.ravel()).strftime('%Y-%m-%d'),
+        'product': np.repeat(stats['product'].to_numpy(), days),
+        'forecasted_units': units.ravel()
+    })
+
+STATS_DTYPES = {
+    'product': object, 'observations': 'int64', 'recent_avg': 'float64', 'trend': 'float64',
+    'growth_rate': 'float64', 'growth_recent_avg': 'float64', 'last_date': 'datetime64[ns]'
+}
+
+class IncrementalForecastState:
+    """Per-product rolling state that absorbs appended sales rows in O(new rows).
+
+    Keeps, per product, the row count, the first and last few units sold and
+    the last date, which is all compute_product_stats needs. stats() returns
+    exactly what compute_product_stats returns on the full history, as long
+    as each product's new rows are not older than its last seen date;
+    out-of-order rows raise ValueError so the caller can rebuild.
+    """
+
+    def __init__(self, window=7, growth_window=7):
+        self.window = window
+        self.growth_window = growth_window
+        self.head_size = max(3, growth_window)
+        self.tail_size = max(3, window, growth_window)
+        self.products = {}
+        self.columns = None
+        self.offset = 0
+        self.fingerprint = b''
+        self._lock = threading.Lock()
+
+    def update(self, df):
+        """Fold new sales rows into the per-product state"""
+        for product, rows in df.groupby('product', sort=False, observed=True):
+            rows = rows.sort_values('date', kind='stable')
+            state = self.products.get(product)
+            if state is not None and rows['date'].iloc[0] < state['last_date']:
+                raise ValueError(f"Out-of-order sales rows for {product}")
+            if state is None:
+                state = self.products[product] = {
+                    'count': 0, 'head': [], 'tail': deque(maxlen=self.tail_size), 'last_date': None}
+            units = rows['units_sold'].astype(float).tolist()
+            missing = self.head_size - len(state['head'])
+            if missing > 0:
+                state['head'].extend(units[:missing])
+            state['tail'].extend(units)
+            state['count'] += len(units)
+            state['last_date'] = rows['date'].iloc[-1]
+
+    def stats(self, products=None):
+        """Current per-product stats, identical to compute_product_stats on the full history"""
+        def mean(values, count, size):
+            return sum(values) / max(min(count, size), 1)
+
+        selected = self.products.items()
+        if products is not None:
+            wanted = set(products)
+            selected = [(product, state) for product, state in selected if product in wanted]
+
+        records = []
+        for product, state in selected:
+            count, head, tail = state['count'], state['head'], list(state['tail'])
+            recent_avg = mean(tail[-self.window:], count, self.window)
+            trend = (mean(tail[-3:], count, 3) - mean(head[:3], count, 3)) / max(count, 1)
+            growth_recent = mean(tail[-self.growth_window:], count, self.growth_window)
+            growth_older = mean(head[:self.growth_window], count, self.growth_window)
+            growth_rate = (growth_recent - growth_older) / growth_older * 100 if growth_older > 0 else 0.0
+            records.append((product, count, recent_avg, trend, growth_rate, growth_recent, state['last_date']))
+
+        # Explicit dtypes so that an empty selection still has a datetime last_date, like compute_product_stats
+        return pd.DataFrame.from_records(records, columns=[
+            'product', 'observations', 'recent_avg', 'trend', 'growth_rate', 'growth_recent_avg', 'last_date'
+        ]).astype(STATS_DTYPES)
+
+    def rebuild(self, path):
+        """Reset the state from the full sales file"""
+        size = os.path.getsize(path)
+        df = load_csv(path, DATASETS['sales'])
+        self.products = {}
+        self.update(df)
+        self.columns = list(df.columns)
+        self._remember_position(path, size)
+
+    def sync(self, path):
+        """Bring the state up to date with the sales file, reading only appended bytes when possible"""
+        with self._lock:
+            size = os.path.getsize(path)
+            if not self.columns or size < self.offset or not self._prefix_unchanged(path):
+                self.rebuild(path)
+                return
+            if size == self.offset:
+                return
+
+            with open(path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                return  # Partial line still being written
+
+            spec = DATASETS['sales']
+            new_rows = pd.read_csv(io.BytesIO(data[:end]), header=None, names=self.columns,
+                                   dtype=spec['dtype'], parse_dates=spec['parse_dates'])
+            try:
+                self.update(new_rows)
+            except ValueError:
+                self.rebuild(path)
+                return
+            self._remember_position(path, self.offset + end)
+
+    def _remember_position(self, path, offset):
+        self.offset = offset
+        with open(path, 'rb') as f:
+            f.seek(max(0, offset - 64))
+            self.fingerprint = f.read(offset - max(0, offset - 64))
+
+    def _prefix_unchanged(self, path):
+        with open(path, 'rb') as f:
+            f.seek(max(0, self.offset - len(self.fingerprint)))
+            return f.read(len(self.fingerprint)) == self.fingerprint
+
+# One incremental state per sales file: the unsharded file (None) or a store shard
+_incremental_states = {}
+_incremental_states_lock = threading.Lock()
+
+def get_incremental_state(store=None):
+    with _incremental_states_lock:
+        if store not in _incremental_states:
+            _incremental_states[store] = IncrementalForecastState()
+        return _incremental_states[store]
+
+@traced('product_stats')
+def get_product_stats(products=None, store=None):
+    """Per-product stats, incrementally maintained when FORECAST_INCREMENTAL=1.
+
+    When products is given, only those products' sales are read and processed.
+    """
+    if FORECAST_INCREMENTAL:
+        state = get_incremental_state(store)
+        state.sync(csv_path('sales', store))
+        return state.stats(products)
+    if products is not None and not products:
+        return compute_product_stats(load_sales_data(store=store).iloc[0:0])
+    return compute_product_stats(load_sales_data(products=products, store=store))
+
+def list_forecastable_products(products=None, window=7, store=None):
+    """Products with enough history to forecast, in catalog order.
+
+    For sharded data without a store, a product qualifies when it does in
+    any store, in order of first appearance across stores.
+    """
+    stores = list_stores() if store is None else []
+    if stores:
+        catalog = {}
+        for shard in stores:
+            catalog.update(dict.fromkeys(list_forecastable_products(products, window, shard)))
+        return list(catalog)
+
+    codes, uniques = pd.factorize(load_sales_data(store=store)['product'], sort=False)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    catalog = [str(product) for product, count in zip(uniques, counts) if count >= window]
+    if products is not None:
+        wanted = set(products)
+        catalog = [product for product in catalog if product in wanted]
+    return catalog
+
+def select_products(products=None, limit=None, cursor=None, store=None):
+    """Resolve the product filter and page to compute, plus the next cursor"""
+    if limit is None and not cursor:
+        return products, None
+    return paginate(list_forecastable_products(products, store=store), limit, cursor)
+
+class SMAForecaster:
+    """Moving average plus head/tail trend, computed for all products at once"""
+    name = 'sma'
+
+    def forecast(self, stats, days=7, window=7, store=None):
+        return build_forecasts(stats, days, window)
+
+def product_data_key(product, dates, units):
+    """Hash of a product's sales history, used to decide whether a model must be refit"""
+    digest = hashlib.sha256(str(product).encode('utf-8'))
+    digest.update(np.asarray(dates, dtype='datetime64[ns]').tobytes())
+    digest.update(np.asarray(units, dtype=float).tobytes())
+    return digest.hexdigest()
+
+def model_file_name(product, store=None):
+    """Cache file of a product's model (per store shard): one file per product, overwritten on refit"""
+    return hashlib.sha256(repr((store, str(product))).encode('utf-8')).hexdigest()[:32] + '.json'
+
+def _prophet_forecast_chunk(items, days, cache_dir):
+    """Fit (or load cached) Prophet models for a chunk of products in a worker process"""
+    import logging
+    from prophet import Prophet
+    from prophet.serialize import model_to_json, model_from_json
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    results, failures = {}, {}
+    for product, file_name, key, dates, units in items:
+        try:
+            # First line: the history hash the model was fitted on; then the model JSON
+            model_path = os.path.join(cache_dir, file_name)
+            model = None
+            if os.path.exists(model_path):
+                with open(model_path) as f:
+                    if f.readline().rstrip('\n') == key:
+                        model = model_from_json(f.read())
+            if model is None:
+                model = Prophet(weekly_seasonality=True, daily_seasonality=False, yearly_seasonality=False)
+                model.fit(pd.DataFrame({'ds': dates, 'y': units}))
+                partial_path = f"{model_path}.{os.getpid()}.tmp"
+                with open(partial_path, 'w') as f:
+                    f.write(key + '\n' + model_to_json(model))
+                os.replace(partial_path, model_path)
+            future = model.make_future_dataframe(periods=days, include_history=False)
+            results[product] = model.predict(future)['yhat'].tolist()
+        except Exception as e:
+            failures[product] = str(e)
+    return results, failures
+
+def default_prophet_workers():
+    from backend.executors import CPU_WORKERS
+    return max(1, (os.cpu_count() or 1) // CPU_WORKERS)
+
+class ProphetForecaster:
+    """Per-product Prophet models fitted in parallel, falling back to SMA.
+
+    Products are split into chunks and fitted across a small pool of fit
+    processes. All fits share one PROPHET_DEADLINE; products whose fit has
+    not finished by then, or failed, use the SMA forecast instead. Fitted
+    models are cached on disk in one file per product (and store), tagged
+    with a hash of the history they were fitted on: a product is only
+    refit when its data changes, and the refit overwrites its file.
+
+    The fit processes are daemonic spawn workers: they are terminated when
+    this process exits, and when a deadline passes with fits still running
+    the pool is terminated and recreated on the next forecast.
+    """
+    name = 'prophet'
+
+    def __init__(self, workers=None, chunk_size=PROPHET_CHUNK_SIZE,
+                 deadline=PROPHET_DEADLINE, cache_dir=PROPHET_CACHE_DIR):
+        self.workers = workers or PROPHET_WORKERS or default_prophet_workers()
+        self.chunk_size = chunk_size
+        self.deadline = deadline
+        self.cache_dir = cache_dir
+        self.last_failures = {}
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.get_context('spawn').Pool(self.workers)
+        return self._pool
+
+    def close(self):
+        """Stop the fit processes, abandoning any fits still running"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    @traced('prophet_fit')
+    def forecast(self, stats, days=7, window=7, store=None):
+        fallback = build_forecasts(stats, days, window)
+        products = fallback['product'].unique().tolist()
+        if not products:
+            return fallback
+
+        df = load_sales_data(products=products, store=store).sort_values(['product', 'date'], kind='stable')
+        items = []
+        for product, rows in df.groupby('product', sort=False, observed=True):
+            dates = rows['date'].to_numpy()
+            units = rows['units_sold'].to_numpy(dtype=float)
+            items.append((product, model_file_name(product, store), product_data_key(product, dates, units),
+                          dates, units))
+
+        pool = self._get_pool()
+        deadline = time.monotonic() + self.deadline
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        pending = [(chunk, pool.apply_async(_prophet_forecast_chunk, (chunk, days, self.cache_dir))) for chunk in chunks]
+
+        predictions, failures = {}, {}
+        for chunk, result in pending:
+            result.wait(max(0.0, deadline - time.monotonic()))
+            if not result.ready():
+                failures.update({item[0]: 'fit deadline exceeded' for item in chunk})
+                continue
+            try:
+                results, chunk_failures = result.get()
+            except Exception as e:
+                results, chunk_failures = {}, {item[0]: str(e) for item in chunk}
+            predictions.update(results)
+            failures.update(chunk_failures)
+        self.last_failures = failures
+        if not all(result.ready() for _, result in pending):
+            # Running fits cannot be cancelled, so drop the processes running them
+            self.close()
+
+        # Replace SMA values with Prophet predictions where a fit succeeded
+        fitted = fallback['product'].isin(list(predictions))
+        if fitted.any():
+            values = np.concatenate([predictions[p] for p in fallback.loc[fitted, 'product'].unique()])
+            fallback.loc[fitted, 'forecasted_units'] = np.maximum(0, np.trunc(values)).astype(np.int64)
+        return fallback
+
+FORECASTERS = {'sma': SMAForecaster, 'prophet': ProphetForecaster}
+_forecasters = {}
+
+def get_forecaster(name=None):
+    """Return the shared forecaster instance for a model name"""
+    name = name or FORECAST_MODEL
+    if name not in FORECASTERS:
+        raise ValueError(f"Unknown forecast model '{name}', expected one of: {', '.join(FORECASTERS)}")
+    if name not in _forecasters:
+        _forecasters[name] = FORECASTERS[name]()
+    return _forecasters[name]
+
+def forecast_result(stats, forecasts):
+    """Forecast response body from product stats and their daily forecasts"""
+    forecastable = stats[stats['observations'] >= 7]
+    rising = forecastable[forecastable['growth_rate'] > 10]
+    rising_products = [
+        {
+            'product': product,
+            'growth_rate': round(float(growth_rate), 2),
+            'avg_daily_demand': int(recent_avg)
+        }
+        for product, growth_rate, recent_avg in zip(
+            rising['product'], rising['growth_rate'], rising['growth_recent_avg'])
+    ]
     rising_products.sort(key=lambda x: x['growth_rate'], reverse=True)
-    
+
     return {
-        'forecasts': all_forecasts,
+        'forecasts': forecasts.to_dict('records'),
         'rising_products': rising_products[:3],
         'alerts': [f"Demand spike expected for {p['product']}" for p in rising_products[:3]]
     }
 
-def get_product_forecast_summary():
-    """Get summary of forecasted demand per product"""
-    df = load_sales_data()
-    products = df['product'].unique()
-    
-    summary = []
-    for product in products:
-        forecast = simple_moving_average_forecast(df, product)
-        if forecast:
-            total_forecast = sum(f['forecasted_units'] for f in forecast)
-            summary.append({
-                'product': product,
-                'next_7_days_demand': total_forecast,
-                'daily_avg': int(total_forecast / 7)
-            })
-    
-    return summary
+def forecast_products(products=None, store=None):
+    """Forecasts and rising products for one store, or for unsharded data"""
+    stats = get_product_stats(products, store)
+    return forecast_result(stats, get_forecaster().forecast(stats, store=store))
+
+def forecast_bundle(products=None, store=None):
+    """Forecast body and per-product forecast summary from a single stats and forecast pass"""
+    stats = get_product_stats(products, store)
+    forecasts = get_forecaster().forecast(stats, store=store)
+    return forecast_result(stats, forecasts), summarize_forecasts(forecasts)
+
+def merge_demand_forecasts(stores, results):
+    """Chain-level rollup of per-store forecast_products results.
+
+    Daily units are summed per product across stores; rising products are
+    the fastest growing product/store pairs.
+    """
+    forecasts = pd.DataFrame([record for result in results for record in result['forecasts']],
+                             columns=['date', 'product', 'forecasted_units'])
+    forecasts['order'] = pd.factorize(forecasts['product'], sort=False)[0]
+    totals = forecasts.groupby(['order', 'product', 'date'], sort=True)['forecasted_units'].sum().reset_index()
+    totals['forecasted_units'] = totals['forecasted_units'].astype(np.int64)
+
+    rising_products = [dict(rising, store_id=store) for store, result in zip(stores, results)
+                       for rising in result['rising_products']]
+    rising_products.sort(key=lambda x: x['growth_rate'], reverse=True)
+    return {
+        'forecasts': totals[['date', 'product', 'forecasted_units']].to_dict('records'),
+        'rising_products': rising_products[:3],
+        'alerts': [f"Demand spike expected for {p['product']} at store {p['store_id']}" for p in rising_products[:3]],
+        'stores': list(stores)
+    }
+
+@traced('forecast')
+def get_demand_forecast(products=None, limit=None, cursor=None, store=None):
+    """Get 7-day forecast for all products (or a filtered page of them)
+
+    With a store, only that store's shard is read. For sharded data without
+    a store, per-store forecasts are merged into a chain-level rollup.
+    """
+    products, next_cursor = select_products(products, limit, cursor, store)
+    stores = list_stores() if store is None else []
+    if stores:
+        result = merge_demand_forecasts(stores, [forecast_products(products, shard) for shard in stores])
+    else:
+        result = forecast_products(products, store)
+    if limit is not None or cursor:
+        result['next_cursor'] = next_cursor
+    return result
+
+def merge_forecast_summaries(summaries):
+    """Chain-level forecast summary: 7-day demand summed per product across stores"""
+    totals = {}
+    for summary in summaries:
+        for item in summary:
+            totals[item['product']] = totals.get(item['product'], 0) + item['next_7_days_demand']
+    return [
+        {'product': product, 'next_7_days_demand': total, 'daily_avg': int(total / 7)}
+        for product, total in totals.items()
+    ]
+
+@traced('forecast_summary')
+def get_product_forecast_summary(products=None, store=None):
+    """Get summary of forecasted demand per product (chain-wide when sharded and no store is given)"""
+    stores = list_stores() if store is None else []
+    if stores:
+        return merge_forecast_summaries([get_product_forecast_summary(products, shard) for shard in stores])
+
+    return summarize_forecasts(get_forecaster().forecast(get_product_stats(products, store), store=store))
+
+def summarize_forecasts(forecasts):
+    """7-day demand total and daily average per product"""
+    totals = forecasts.groupby('product', sort=False)['forecasted_units'].sum()
+
+    return [
+        {
+            'product': product,
+            'next_7_days_demand': int(total),
+            'daily_avg': int(total / 7)
+        }
+        for product, total in totals.items()
+    ]
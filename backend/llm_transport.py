@@ -0,0 +1,401 @@
+"""Bounded transport for copilot LLM completions.
+
+Every completion goes through one shared LLMTransport, which:
+
+- reuses keep-alive connections from a single pooled async HTTP client,
+- caps in-flight completions at COPILOT_MAX_CONCURRENCY and paces new ones
+  with a token bucket (COPILOT_RATE_PER_SECOND, bursts of COPILOT_RATE_BURST),
+- retries timeouts, 429s and 5xx responses with exponential backoff (or the
+  provider's Retry-After), but only while the COPILOT_DEADLINE allows,
+- opens a circuit breaker after COPILOT_BREAKER_THRESHOLD consecutive
+  failures and fails fast for COPILOT_BREAKER_COOLDOWN seconds.
+
+When no completion can be had, LLMUnavailable is raised and the copilot
+answers from the business data alone. COPILOT_PROVIDER=stub swaps in an
+offline provider that needs no network or API key, for load tests.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+import httpx
+
+COPILOT_PROVIDER = os.getenv('COPILOT_PROVIDER', 'groq')  # 'groq' or 'stub'
+COPILOT_API_URL = os.getenv('COPILOT_API_URL', 'https://api.groq.com/openai/v1/chat/completions')
+COPILOT_MAX_CONCURRENCY = int(os.getenv('COPILOT_MAX_CONCURRENCY', '8'))
+COPILOT_RATE_PER_SECOND = float(os.getenv('COPILOT_RATE_PER_SECOND', '4'))  # 0 disables rate limiting
+COPILOT_RATE_BURST = int(os.getenv('COPILOT_RATE_BURST', '8'))
+COPILOT_CONNECT_TIMEOUT = float(os.getenv('COPILOT_CONNECT_TIMEOUT', '5'))
+COPILOT_READ_TIMEOUT = float(os.getenv('COPILOT_READ_TIMEOUT', '30'))
+# Total time a request may spend queueing, calling and retrying before falling back
+COPILOT_DEADLINE = float(os.getenv('COPILOT_DEADLINE', '45'))
+COPILOT_MAX_RETRIES = int(os.getenv('COPILOT_MAX_RETRIES', '3'))
+COPILOT_BACKOFF = float(os.getenv('COPILOT_BACKOFF', '0.5'))
+COPILOT_BREAKER_THRESHOLD = int(os.getenv('COPILOT_BREAKER_THRESHOLD', '5'))
+COPILOT_BREAKER_COOLDOWN = float(os.getenv('COPILOT_BREAKER_COOLDOWN', '30'))
+COPILOT_STUB_LATENCY = float(os.getenv('COPILOT_STUB_LATENCY', '0.2'))
+COPILOT_STUB_FAILURE_RATE = float(os.getenv('COPILOT_STUB_FAILURE_RATE', '0'))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMUnavailable(Exception):
+    """No completion could be obtained; callers answer from the data instead"""
+
+class RetryableError(Exception):
+    """A transient provider failure, with the delay the provider asked for if any"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def describe(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return "LLM call timed out"
+    return str(error) or type(error).__name__
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (HTTP-date values are ignored)"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, with bursts of up to `burst`"""
+
+    def __init__(self, rate=COPILOT_RATE_PER_SECOND, burst=COPILOT_RATE_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, deadline):
+        """Take a token, waiting for one unless that would run past the deadline"""
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            wait = (1 - self._tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise LLMUnavailable("LLM rate limit leaves no time before the request deadline")
+            await asyncio.sleep(wait)
+
+    def available(self):
+        if self.rate <= 0:
+            return None
+        self._refill()
+        return round(self._tokens, 2)
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures.
+
+    While open, calls are rejected. Once `cooldown` seconds have passed a
+    single trial call is let through (half-open): success closes the
+    breaker, failure opens it for another cooldown.
+    """
+
+    def __init__(self, threshold=COPILOT_BREAKER_THRESHOLD, cooldown=COPILOT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self._opened_at >= self.cooldown else 'open'
+
+    def allow(self):
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial or (self._opened_at is None and self.failures >= self.threshold):
+            self._opened_at = time.monotonic()
+            self.trips += 1
+        self._trial = False
+
+    def abandon(self):
+        """A permitted call ended without an outcome, e.g. the client went away"""
+        self._trial = False
+
+    def stats(self):
+        return {'state': self.state, 'consecutive_failures': self.failures, 'trips': self.trips}
+
+class GroqProvider:
+    """OpenAI-compatible chat completions over a pooled async HTTP client"""
+
+    name = 'groq'
+
+    def __init__(self, url=COPILOT_API_URL, api_key=None, max_connections=COPILOT_MAX_CONCURRENCY):
+        self.url = url
+        self.api_key = api_key or os.getenv('GROQ_API_KEY')
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(COPILOT_READ_TIMEOUT, connect=COPILOT_CONNECT_TIMEOUT)
+        )
+
+    def _request(self, messages, timeout, params, stream=False):
+        if not self.api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+        return {
+            'url': self.url,
+            'json': dict(params, messages=messages, stream=stream),
+            'headers': {'Authorization': f"Bearer {self.api_key}"},
+            'timeout': httpx.Timeout(timeout, connect=min(timeout, COPILOT_CONNECT_TIMEOUT))
+        }
+
+    def _check(self, response):
+        if response.status_code in RETRYABLE_STATUS:
+            raise RetryableError(f"{self.name} returned HTTP {response.status_code}",
+                                 parse_retry_after(response.headers.get('retry-after')))
+        response.raise_for_status()
+
+    async def complete(self, messages, timeout, **params):
+        try:
+            response = await self.client.post(**self._request(messages, timeout, params))
+        except httpx.TransportError as e:
+            raise RetryableError(describe(e)) from e
+        self._check(response)
+        return response.json()['choices'][0]['message']['content']
+
+    async def stream(self, messages, timeout, **params):
+        try:
+            async with self.client.stream('POST', **self._request(messages, timeout, params, stream=True)) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                self._check(response)
+                async for line in response.aiter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    choices = json.loads(data).get('choices')
+                    content = choices[0].get('delta', {}).get('content') if choices else None
+                    if content:
+                        yield content
+        except httpx.TransportError as e:
+            raise RetryableError(describe(e)) from e
+
+    async def aclose(self):
+        await self.client.aclose()
+
+class StubProvider:
+    """Offline provider for load tests: a canned answer after a fixed latency.
+
+    COPILOT_STUB_FAILURE_RATE makes that share of calls fail as if the
+    provider returned a 503, to exercise retries and the circuit breaker.
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency=COPILOT_STUB_LATENCY, failure_rate=COPILOT_STUB_FAILURE_RATE):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def answer(self, messages):
+        return f"[stub] Based on the current business data, here is my take on: {messages[-1]['content'].strip()}"
+
+    async def _respond(self, timeout):
+        await asyncio.sleep(min(self.latency, timeout))
+        if self.latency > timeout:
+            raise RetryableError("stub provider timed out")
+        if random.random() < self.failure_rate:
+            raise RetryableError("stub provider returned HTTP 503")
+
+    async def complete(self, messages, timeout, **params):
+        await self._respond(timeout)
+        return self.answer(messages)
+
+    async def stream(self, messages, timeout, **params):
+        await self._respond(timeout)
+        for i, word in enumerate(self.answer(messages).split(' ')):
+            yield word if i == 0 else ' ' + word
+
+    async def aclose(self):
+        pass
+
+PROVIDERS = {'groq': GroqProvider, 'stub': StubProvider}
+
+class LLMTransport:
+    """Bounded, retrying, circuit-broken access to an LLM provider"""
+
+    def __init__(self, provider, max_concurrency=COPILOT_MAX_CONCURRENCY, bucket=None, breaker=None,
+                 deadline=COPILOT_DEADLINE, max_retries=COPILOT_MAX_RETRIES, backoff=COPILOT_BACKOFF):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.counts = {'requests': 0, 'completed': 0, 'retries': 0, 'failed': 0, 'rejected': 0}
+
+    def _attempt_timeout(self, deadline):
+        return max(0.0, min(COPILOT_READ_TIMEOUT, deadline - time.monotonic()))
+
+    async def _admit(self, deadline):
+        """Wait for rate-limit budget, failing fast while the breaker is open"""
+        if self.breaker.state == 'open':
+            self.counts['rejected'] += 1
+            raise LLMUnavailable("LLM circuit breaker is open")
+        await self.bucket.acquire(deadline)
+
+    @asynccontextmanager
+    async def _slot(self, deadline):
+        """Hold one of the concurrency slots for a provider call"""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise LLMUnavailable("No LLM slot freed up before the request deadline") from None
+        finally:
+            self.waiting -= 1
+        if not self.breaker.allow():
+            self._semaphore.release()
+            self.counts['rejected'] += 1
+            raise LLMUnavailable("LLM circuit breaker is open")
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _retry_delay(self, error, attempt, deadline):
+        """Backoff before the next attempt, or LLMUnavailable when it is time to give up"""
+        if isinstance(error, LLMUnavailable):
+            self.counts['failed'] += 1
+            raise error
+        self.breaker.record_failure()
+        delay = getattr(error, 'retry_after', None)
+        if delay is None:
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+        if (not isinstance(error, (RetryableError, asyncio.TimeoutError)) or attempt >= self.max_retries
+                or time.monotonic() + delay >= deadline or self.breaker.state != 'closed'):
+            self.counts['failed'] += 1
+            raise LLMUnavailable(describe(error)) from error
+        return delay
+
+    async def complete(self, messages, **params):
+        """The full answer text, retried within the deadline"""
+        deadline = time.monotonic() + self.deadline
+        self.counts['requests'] += 1
+        attempt = 0
+        while True:
+            try:
+                await self._admit(deadline)
+                async with self._slot(deadline):
+                    timeout = self._attempt_timeout(deadline)
+                    answer = await asyncio.wait_for(self.provider.complete(messages, timeout, **params), timeout)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+            else:
+                self.breaker.record_success()
+                self.counts['completed'] += 1
+                return answer
+            attempt += 1
+            self.counts['retries'] += 1
+            await asyncio.sleep(delay)
+
+    async def stream(self, messages, **params):
+        """Yield answer chunks as they arrive.
+
+        Attempts are retried only until the first chunk has been yielded;
+        a failure after that ends the stream with LLMUnavailable.
+        """
+        deadline = time.monotonic() + self.deadline
+        self.counts['requests'] += 1
+        attempt = 0
+        while True:
+            started = False
+            try:
+                await self._admit(deadline)
+                async with self._slot(deadline):
+                    chunks = self.provider.stream(messages, self._attempt_timeout(deadline), **params)
+                    try:
+                        async for chunk in chunks:
+                            started = True
+                            yield chunk
+                    finally:
+                        await chunks.aclose()
+            except (asyncio.CancelledError, GeneratorExit):
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not started:
+                    delay = self._retry_delay(e, attempt, deadline)
+                else:
+                    self.breaker.record_failure()
+                    self.counts['failed'] += 1
+                    raise LLMUnavailable(f"LLM stream interrupted: {describe(e)}") from e
+            else:
+                self.breaker.record_success()
+                self.counts['completed'] += 1
+                return
+            attempt += 1
+            self.counts['retries'] += 1
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return dict(self.counts, provider=self.provider.name, in_flight=self.in_flight, waiting=self.waiting,
+                    max_concurrency=self.max_concurrency, rate_tokens=self.bucket.available(),
+                    breaker=self.breaker.stats())
+
+_transport = None
+
+def build_provider(name=None):
+    name = name or COPILOT_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown copilot provider '{name}', expected one of: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+def get_transport():
+    """Shared transport for the configured provider, created on first use"""
+    global _transport
+    if _transport is None:
+        _transport = LLMTransport(build_provider())
+    return _transport
+
+def set_transport(transport):
+    """Use a specific transport, e.g. one around a custom provider"""
+    global _transport
+    _transport = transport
+
+async def close_transport():
+    """Close the provider's pooled connections, e.g. on application shutdown"""
+    global _transport
+    transport, _transport = _transport, None
+    if transport is not None:
+        await transport.provider.aclose()
@@ -1,12 +1,36 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+import time
+from typing import Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 from pydantic import BaseModel
-from backend.forecasting import get_demand_forecast
 from backend.sentiment import analyze_sentiment
-from backend.recommendations import get_stock_alerts, get_pricing_suggestions
-from backend.chat_copilot import chat_with_copilot
+from backend.dashboard import parse_sections, get_dashboard, dashboard_events
+from backend.shards import check_store, demand_forecast, stock_alerts, pricing_suggestions, policy_simulation
+from backend.data_store import list_stores
+from backend.chat_copilot import chat_with_copilot, stream_copilot, response_cache
+from backend.llm_transport import get_transport, close_transport
+from backend.executors import run_cpu, get_cpu_pool, shutdown_pools
+from backend.query import QueryError, split_values, project
+from backend.responses import FastJSONResponse, CompressionMiddleware, dumps
+from backend.tracing import TracingMiddleware, metrics, get_profile, render_collapsed
+from backend.warmup import start_warmup, get_readiness
+from backend.scheduler import PRECOMPUTE_ENABLED, scheduler, start_scheduler, etag_matches
 
-app = FastAPI(title="MarketMind AI API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app):
+    # Create the CPU pool before any background task can race to create its own
+    get_cpu_pool()
+    background = [task for task in (start_warmup(), start_scheduler()) if task is not None]
+    yield
+    for task in background:
+        task.cancel()
+    await close_transport()
+    shutdown_pools()
+
+app = FastAPI(title="MarketMind AI API", version="1.0.0", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -16,12 +40,47 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(TracingMiddleware)
 
 class ChatRequest(BaseModel):
     question: str
+    stream: bool = False
+
+class SimulationRequest(BaseModel):
+    grid: Dict[str, List[float]] = {}
+    scenarios: List[Dict[str, float]] = []
+    product: Optional[List[str]] = None
+
+async def precomputed_response(name, request):
+    """Serve the scheduler's latest stored result, honouring If-None-Match.
+
+    The ETag is weak because the same result is sent identity, gzip or
+    brotli encoded depending on Accept-Encoding.
+    """
+    entry = await scheduler.get(name)
+    headers = {
+        'ETag': 'W/' + entry['etag'],
+        'X-Result-Version': str(entry['version']),
+        'Age': str(int(max(0, time.time() - entry['computed_at']))),
+        'Vary': 'Accept-Encoding'
+    }
+    if etag_matches(request.headers.get('if-none-match'), entry['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(entry['body'], media_type='application/json', headers=headers)
+
+def serve_precomputed(*params):
+    """Unfiltered, unpaged requests are answered from precomputed results when enabled"""
+    return PRECOMPUTE_ENABLED and all(param is None for param in params)
+
+async def encode_events(events, sse):
+    """Encode copilot events as Server-Sent Events or NDJSON lines"""
+    async for event in events:
+        payload = dumps(event).decode('utf-8')
+        yield f"event: {event['type']}\ndata: {payload}\n\n" if sse else payload + "\n"
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {
         "message": "MarketMind AI - Retail Intelligence API",
         "version": "1.0.0",
@@ -30,55 +89,214 @@ def read_root():
             "/stock-alerts",
             "/sentiment",
             "/pricing-suggestions",
-            "/chat"
+            "/dashboard",
+            "/simulate",
+            "/stores",
+            "/chat",
+            "/chat/cache-stats",
+            "/chat/transport-stats",
+            "/precompute/status",
+            "/metrics",
+            "/ready"
         ]
     }
 
 @app.get("/forecast")
-def get_forecast():
+async def get_forecast(
+    request: Request,
+    product: Optional[List[str]] = Query(None, description="Products to forecast (repeatable or comma-separated)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Products per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated forecast fields to return"),
+    store: Optional[str] = Query(None, description="Store id; omit for the chain-wide rollup")
+):
     """Get 7-day demand forecast"""
     try:
-        result = get_demand_forecast()
-        return result
+        if serve_precomputed(product, limit, cursor, fields, store):
+            return await precomputed_response('forecast', request)
+        check_store(store)
+        result = await demand_forecast(products=split_values(product), limit=limit, cursor=cursor, store=store)
+        result['forecasts'] = project(result['forecasts'], split_values(fields))
+        return FastJSONResponse(result)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/stock-alerts")
-def get_alerts():
+async def get_alerts(
+    request: Request,
+    product: Optional[List[str]] = Query(None, description="Products to evaluate (repeatable or comma-separated)"),
+    risk_level: Optional[List[str]] = Query(None, description="HIGH, MEDIUM and/or LOW"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Alerts per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated alert fields to return"),
+    store: Optional[str] = Query(None, description="Store id; omit for the chain-wide rollup")
+):
     """Get inventory alerts and reorder recommendations"""
     try:
-        result = get_stock_alerts()
-        return result
+        if serve_precomputed(product, risk_level, limit, cursor, fields, store):
+            return await precomputed_response('stock_alerts', request)
+        check_store(store)
+        risk_levels = split_values(risk_level)
+        if risk_levels is not None:
+            risk_levels = [level.upper() for level in risk_levels]
+        result = await stock_alerts(products=split_values(product), risk_level=risk_levels,
+                                    limit=limit, cursor=cursor, store=store)
+        result['alerts'] = project(result['alerts'], split_values(fields))
+        return FastJSONResponse(result)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/sentiment")
-def get_sentiment():
+async def get_sentiment(
+    request: Request,
+    product: Optional[List[str]] = Query(None, description="Products whose reviews to analyze (repeatable or comma-separated)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Products per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated product_sentiment fields to return")
+):
     """Get customer sentiment analysis"""
     try:
-        result = analyze_sentiment()
-        return result
+        if serve_precomputed(product, limit, cursor, fields):
+            return await precomputed_response('sentiment', request)
+        result = await run_cpu(analyze_sentiment, products=split_values(product), limit=limit, cursor=cursor)
+        selected = split_values(fields)
+        if selected:
+            result['product_sentiment'] = {
+                name: project([stats], selected)[0] for name, stats in result['product_sentiment'].items()
+            }
+        return FastJSONResponse(result)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/pricing-suggestions")
-def get_pricing():
+async def get_pricing(
+    request: Request,
+    product: Optional[List[str]] = Query(None, description="Products to price (repeatable or comma-separated)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Suggestions per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated suggestion fields to return")
+):
     """Get pricing recommendations"""
     try:
-        result = get_pricing_suggestions()
-        return result
+        if serve_precomputed(product, limit, cursor, fields):
+            return await precomputed_response('pricing_suggestions', request)
+        result = await pricing_suggestions(products=split_values(product), limit=limit, cursor=cursor)
+        result['suggestions'] = project(result['suggestions'], split_values(fields))
+        return FastJSONResponse(result)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/dashboard")
+async def get_dashboard_view(
+    request: Request,
+    section: Optional[List[str]] = Query(None, description="forecast, stock_alerts, sentiment and/or pricing_suggestions (default: all)"),
+    product: Optional[List[str]] = Query(None, description="Products to include (repeatable or comma-separated)"),
+    stream: bool = Query(False, description="Stream each section as soon as it is ready")
+):
+    """Several dashboard sections in one round trip
+
+    The forecast is computed once and shared by the stock-alert and pricing
+    sections. With stream=true, sections arrive as NDJSON events (or SSE
+    when the client accepts text/event-stream) in completion order.
+    """
+    try:
+        sections = parse_sections(split_values(section))
+        products = split_values(product)
+        if stream:
+            sse = 'text/event-stream' in request.headers.get('accept', '')
+            return StreamingResponse(encode_events(dashboard_events(sections, products), sse),
+                                     media_type='text/event-stream' if sse else 'application/x-ndjson')
+        return FastJSONResponse(await get_dashboard(sections, products))
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stores")
+async def get_stores():
+    """Store ids with sharded data (empty when sales and inventory are not sharded)"""
+    return {"stores": list_stores()}
+
+@app.post("/simulate")
+async def simulate(request: SimulationRequest):
+    """What-if evaluation of reorder and pricing policies
+
+    "grid" maps policy parameters to candidate values and is expanded to
+    every combination; "scenarios" adds explicit parameter sets. Each
+    scenario reports stockouts, reorder units and the 7-day revenue delta.
+    """
+    try:
+        result = await policy_simulation(grid=request.grid, scenarios=request.scenarios,
+                                         products=split_values(request.product))
+        return FastJSONResponse(result)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat")
-def chat(request: ChatRequest):
-    """AI Copilot chat endpoint"""
+async def chat(request: ChatRequest, http_request: Request):
+    """AI Copilot chat endpoint
+
+    Set "stream": true to receive NDJSON events (or SSE when the client
+    accepts text/event-stream) instead of a single JSON response.
+    """
+    if request.stream:
+        sse = 'text/event-stream' in http_request.headers.get('accept', '')
+        return StreamingResponse(encode_events(stream_copilot(request.question), sse),
+                                 media_type='text/event-stream' if sse else 'application/x-ndjson')
     try:
-        result = chat_with_copilot(request.question)
-        return result
+        result = await chat_with_copilot(request.question)
+        return FastJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/chat/cache-stats")
+async def chat_cache_stats():
+    """Hit-rate metrics of the copilot response cache"""
+    return response_cache.stats()
+
+@app.get("/chat/transport-stats")
+async def chat_transport_stats():
+    """Concurrency, rate-limit, retry and circuit-breaker state of the copilot LLM transport"""
+    return get_transport().stats()
+
+@app.get("/precompute/status")
+async def precompute_status():
+    """Versions, ages and run counts of the precomputed endpoint results"""
+    return scheduler.stats()
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the optional startup warm-up has finished"""
+    state = get_readiness()
+    return FastJSONResponse(state, status_code=200 if state['ready'] else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage timings, cache hit counts and request latencies in Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: int):
+    """Collapsed stacks of a request profiled with the X-Profile header
+
+    Covers the request's calls in the I/O pool threads and CPU workers
+    only; the shared event loop is not sampled.
+    """
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(render_collapsed(profile['samples']))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
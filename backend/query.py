@@ -0,0 +1,45 @@
+import base64
+import json
+
+class QueryError(ValueError):
+    """Invalid filtering or pagination parameters supplied by a client"""
+
+def encode_cursor(offset):
+    """Opaque pagination cursor for an offset"""
+    return base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Offset encoded in a cursor (0 when no cursor is given)"""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded.encode()))['offset']
+    except (ValueError, KeyError, TypeError):
+        raise QueryError(f"Invalid cursor: {cursor}")
+    if not isinstance(offset, int) or offset < 0:
+        raise QueryError(f"Invalid cursor: {cursor}")
+    return offset
+
+def paginate(items, limit=None, cursor=None):
+    """Slice a sequence into one page, returning the page and the next cursor"""
+    offset = decode_cursor(cursor)
+    if limit is None:
+        return items[offset:], None
+    end = offset + limit
+    return items[offset:end], encode_cursor(end) if end < len(items) else None
+
+def split_values(values):
+    """Normalize repeated and comma-separated query values into a list (or None)"""
+    if not values:
+        return None
+    if isinstance(values, str):
+        values = [values]
+    parts = [part.strip() for value in values for part in value.split(',')]
+    return [part for part in parts if part] or None
+
+def project(records, fields):
+    """Keep only the requested fields of each record"""
+    if not fields:
+        return records
+    return [{field: record[field] for field in fields if field in record} for record in records]
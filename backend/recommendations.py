@@ -1,97 +1,224 @@
 import pandas as pd
+import numpy as np
 from backend.forecasting import get_product_forecast_summary
+from backend.data_store import load_dataset, list_stores
+from backend.query import paginate, QueryError
+from backend.tracing import traced
+
+RISK_ORDER = {'HIGH': 0, 'MEDIUM': 1, 'LOW': 2}
+
+# Live reorder policy; /simulate evaluates alternatives to it
+STOCK_POLICY = {
+    'high_risk_ratio': 0.5,          # stock below this share of 7-day demand is HIGH risk
+    'medium_risk_ratio': 1,          # ... and below this share MEDIUM risk
+    'high_reorder_multiple': 2,      # reorder this many times 7-day demand at HIGH risk
+    'medium_reorder_multiple': 1     # ... and at MEDIUM risk
+}
+
+# Live pricing policy, rules applied in order
+PRICING_POLICY = {
+    'undercut_ratio': 0.95,          # competitor below this share of our price: match it
+    'undercut_amount': 0.01,         # ... minus this amount
+    'high_demand_threshold': 50,     # daily demand above this: raise the price
+    'high_demand_uplift': 0.05,
+    'below_market_ratio': 1.1,       # competitor above this share of our price: raise it
+    'below_market_uplift': 0.08
+}
+
+PRICING_REASONS = [
+    "Competitor pricing lower - suggest discount to stay competitive",
+    "High demand detected - opportunity for price increase",
+    "Priced below market - room for margin improvement"
+]
+
+INVENTORY_COLUMNS = ['product', 'stock_left', 'warehouse_id']
+
+def load_inventory_data(products=None, store=None):
+    """Load inventory from CSV (cached until the file changes), or one store's shard of it"""
+    df = load_dataset('inventory', products=products, store=store)
+    return df[[column for column in INVENTORY_COLUMNS if column in df.columns]]
+
+def load_pricing_data(products=None):
+    """Load pricing data from CSV (cached until the file changes)"""
+    return load_dataset('pricing', columns=['product', 'current_price', 'competitor_price'], products=products)
+
+def index_by_product(df):
+    """Index a frame by product name, keeping the first row per product"""
+    df = df.drop_duplicates('product')
+    return df.set_index(pd.Index(df['product'].astype(object), name=None))
+
+def forecast_summary_frame(forecast_summary):
+    """Forecast summary list as a product-indexed frame"""
+    frame = pd.DataFrame(forecast_summary, columns=['product', 'next_7_days_demand', 'daily_avg'])
+    return index_by_product(frame)
+
+def apply_stock_policy(stock, demand, policy):
+    """HIGH and MEDIUM risk masks and reorder quantities under a reorder policy.
+
+    Policy values may be scalars or per-scenario column arrays, in which
+    case the results broadcast to scenario x product arrays.
+    """
+    high = stock < demand * policy['high_risk_ratio']
+    medium = ~high & (stock < demand * policy['medium_risk_ratio'])
+    reorder = np.select([high, medium], [demand * policy['high_reorder_multiple'],
+                                         demand * policy['medium_reorder_multiple']], 0)
+    return high, medium, reorder
+
+def apply_pricing_policy(current, competitor, demand, policy):
+    """Rule masks and suggested prices under a pricing policy (broadcasts like apply_stock_policy)"""
+    conditions = [
+        competitor < current * policy['undercut_ratio'],
+        demand > policy['high_demand_threshold'],
+        competitor > current * policy['below_market_ratio']
+    ]
+    suggested = np.select(conditions, [
+        competitor - policy['undercut_amount'],
+        current * (1 + policy['high_demand_uplift']),
+        current * (1 + policy['below_market_uplift'])
+    ], current)
+    return conditions, suggested
+
+@traced('stock_alerts')
+def compute_stock_alerts(inventory_df, forecast_summary):
+    """Join inventory with forecasted demand and derive risk levels as column operations"""
+    summary = forecast_summary_frame(forecast_summary)
+    inventory = index_by_product(inventory_df)[[c for c in INVENTORY_COLUMNS[1:] if c in inventory_df.columns]]
+    frame = summary.join(inventory, how='inner')
+
+    stock = frame['stock_left'].to_numpy()
+    demand = frame['next_7_days_demand'].to_numpy()
+    daily_avg = frame['daily_avg'].to_numpy()
+
+    high, medium, reorder = apply_stock_policy(stock, demand, STOCK_POLICY)
+    frame['risk_level'] = np.select([high, medium], ['HIGH', 'MEDIUM'], 'LOW')
+    frame['reorder_qty'] = reorder
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frame['days_until_stockout'] = np.where(
+            daily_avg > 0, np.trunc(stock / np.where(daily_avg > 0, daily_avg, 1)), 999).astype(np.int64)
 
-def load_inventory_data():
-    """Load inventory from CSV"""
-    return pd.read_csv('data/inventory.csv')
-
-def load_pricing_data():
-    """Load pricing data from CSV"""
-    return pd.read_csv('data/pricing.csv')
-
-def get_stock_alerts():
-    """Generate inventory alerts and reorder recommendations"""
-    inventory_df = load_inventory_data()
-    forecast_summary = get_product_forecast_summary()
-    
-    alerts = []
-    for forecast in forecast_summary:
-        product = forecast['product']
-        forecasted_demand = forecast['next_7_days_demand']
-        
-        inventory_row = inventory_df[inventory_df['product'] == product]
-        if inventory_row.empty:
-            continue
-        
-        stock_left = inventory_row.iloc[0]['stock_left']
-        
-        # Calculate risk level
-        if stock_left < forecasted_demand * 0.5:
-            risk_level = 'HIGH'
-            reorder_qty = forecasted_demand * 2
-        elif stock_left < forecasted_demand:
-            risk_level = 'MEDIUM'
-            reorder_qty = forecasted_demand
-        else:
-            risk_level = 'LOW'
-            reorder_qty = 0
-        
-        alerts.append({
-            'product': product,
-            'stock_left': int(stock_left),
-            'forecasted_demand_7d': forecasted_demand,
-            'risk_level': risk_level,
-            'reorder_qty': int(reorder_qty),
-            'days_until_stockout': int(stock_left / forecast['daily_avg']) if forecast['daily_avg'] > 0 else 999
-        })
-    
     # Sort by risk level
-    risk_order = {'HIGH': 0, 'MEDIUM': 1, 'LOW': 2}
-    alerts.sort(key=lambda x: risk_order[x['risk_level']])
-    
-    return {
-        'alerts': alerts,
-        'critical_count': sum(1 for a in alerts if a['risk_level'] == 'HIGH'),
-        'warning_count': sum(1 for a in alerts if a['risk_level'] == 'MEDIUM')
+    frame = frame.sort_values('risk_level', key=lambda s: s.map(RISK_ORDER), kind='stable')
+    columns = ['product', 'stock_left', 'forecasted_demand_7d', 'risk_level', 'reorder_qty', 'days_until_stockout']
+    if 'warehouse_id' in frame.columns:
+        frame['warehouse_id'] = frame['warehouse_id'].astype(object)
+        columns.append('warehouse_id')
+    return frame.rename(columns={'next_7_days_demand': 'forecasted_demand_7d'})[columns]
+
+@traced('pricing_rules')
+def compute_pricing_suggestions(pricing_df, forecast_summary):
+    """Apply the rule-based pricing logic to every product at once"""
+    daily_avg = forecast_summary_frame(forecast_summary)['daily_avg']
+    current = pricing_df['current_price'].to_numpy(dtype=float)
+    competitor = pricing_df['competitor_price'].to_numpy(dtype=float)
+    demand = pricing_df['product'].astype(object).map(daily_avg).to_numpy(dtype=float)
+
+    # Rule-based pricing logic
+    conditions, suggested = apply_pricing_policy(current, competitor, demand, PRICING_POLICY)
+    reason = np.select(conditions, PRICING_REASONS, "Current pricing is optimal")
+
+    return pd.DataFrame({
+        'product': pricing_df['product'].astype(object).to_numpy(),
+        'current_price': np.round(current, 2),
+        'competitor_price': np.round(competitor, 2),
+        'suggested_price': np.round(suggested, 2),
+        'potential_change': np.round((suggested - current) / current * 100, 2),
+        'reason': reason
+    })
+
+def validate_risk_levels(risk_level):
+    unknown = set(risk_level or []) - set(RISK_ORDER)
+    if unknown:
+        raise QueryError(f"Unknown risk level: {', '.join(sorted(unknown))}")
+
+def store_stock_alerts(products=None, risk_level=None, store=None, forecast_summary=None):
+    """Alerts frame for one store, or for unsharded data
+
+    Pass forecast_summary to reuse a summary already computed for the same store.
+    """
+    if forecast_summary is None:
+        forecast_summary = get_product_forecast_summary(products, store)
+    alerts = compute_stock_alerts(load_inventory_data(products, store), forecast_summary)
+    if store is not None:
+        alerts.insert(1, 'store_id', store)
+    if risk_level is not None:
+        alerts = alerts[alerts['risk_level'].isin(list(risk_level))]
+    return alerts
+
+def merge_stock_alerts(frames):
+    """Concatenate per-store alerts, most urgent first (stores keep their order within a risk level)"""
+    alerts = pd.concat(frames, ignore_index=True)
+    return alerts.sort_values('risk_level', key=lambda s: s.map(RISK_ORDER), kind='stable')
+
+def chain_rollups(alerts):
+    """Per-product (and, when known, per-warehouse) totals over store alerts"""
+    at_risk = alerts['risk_level'] != 'LOW'
+    by_product = alerts.assign(at_risk=at_risk).groupby('product', sort=False).agg(
+        stores_at_risk=('at_risk', 'sum'), stock_left=('stock_left', 'sum'),
+        forecasted_demand_7d=('forecasted_demand_7d', 'sum'), reorder_qty=('reorder_qty', 'sum'))
+    by_product = by_product[by_product['stores_at_risk'] > 0].sort_values('reorder_qty', ascending=False, kind='stable')
+    rollups = {'product_rollup': by_product.reset_index().astype({'product': object}).to_dict('records')}
+    if 'warehouse_id' in alerts.columns:
+        by_warehouse = alerts[at_risk].groupby('warehouse_id', sort=True).agg(
+            stores=('store_id', 'nunique'), alerts=('product', 'size'), reorder_qty=('reorder_qty', 'sum'))
+        rollups['warehouse_rollup'] = by_warehouse.reset_index().to_dict('records')
+    return rollups
+
+def format_stock_alerts(alerts, limit=None, cursor=None, chain=False):
+    """Page of alerts plus counts over all of them (and chain rollups for merged stores)"""
+    risk = alerts['risk_level']
+    page, next_cursor = paginate(alerts, limit, cursor)
+
+    result = {
+        'alerts': page.to_dict('records'),
+        'critical_count': int((risk == 'HIGH').sum()),
+        'warning_count': int((risk == 'MEDIUM').sum())
     }
+    if chain:
+        result.update(chain_rollups(alerts))
+    if limit is not None or cursor:
+        result['next_cursor'] = next_cursor
+    return result
+
+def get_stock_alerts(products=None, risk_level=None, limit=None, cursor=None, store=None):
+    """Generate inventory alerts and reorder recommendations
+
+    Only the requested products are forecast. Risk levels depend on the
+    forecast, so the risk_level filter and pagination apply afterwards.
+    With a store, only that store's shards are read; for sharded data
+    without a store, every store is evaluated and rolled up chain-wide.
+    """
+    validate_risk_levels(risk_level)
+    stores = list_stores() if store is None else []
+    if stores:
+        alerts = merge_stock_alerts([store_stock_alerts(products, risk_level, shard) for shard in stores])
+    else:
+        alerts = store_stock_alerts(products, risk_level, store)
+    return format_stock_alerts(alerts, limit, cursor, chain=bool(stores))
+
+def get_pricing_suggestions(products=None, limit=None, cursor=None, forecast_summary=None):
+    """Generate pricing recommendations
+
+    Pages are taken from the pricing table first, so only the products on
+    the requested page are forecast. Pass forecast_summary to reuse a
+    chain-level summary that already covers those products.
+    """
+    pricing_df, next_cursor, page_products = pricing_page(products, limit, cursor)
+    if forecast_summary is None:
+        forecast_summary = get_product_forecast_summary(page_products)
+    suggestions = compute_pricing_suggestions(pricing_df, forecast_summary)
+
+    result = {'suggestions': suggestions.to_dict('records')}
+    if limit is not None or cursor:
+        result['next_cursor'] = next_cursor
+    return result
+
+def pricing_page(products=None, limit=None, cursor=None):
+    """Requested page of the pricing table, the next cursor and the products to forecast for it (None: all)"""
+    pricing_df, next_cursor = paginate(load_pricing_data(products), limit, cursor)
+    paged = limit is not None or bool(cursor)
+    page_products = pricing_df['product'].astype(object).unique().tolist() if paged or products is not None else None
+    return pricing_df, next_cursor, page_products
 
-def get_pricing_suggestions():
-    """Generate pricing recommendations"""
-    pricing_df = load_pricing_data()
-    forecast_summary = get_product_forecast_summary()
-    
-    suggestions = []
-    for _, row in pricing_df.iterrows():
-        product = row['product']
-        current_price = row['current_price']
-        competitor_price = row['competitor_price']
-        
-        # Find demand trend
-        forecast = next((f for f in forecast_summary if f['product'] == product), None)
-        
-        reason = ""
-        suggested_price = current_price
-        
-        # Rule-based pricing logic
-        if competitor_price < current_price * 0.95:
-            suggested_price = competitor_price - 0.01
-            reason = "Competitor pricing lower - suggest discount to stay competitive"
-        elif forecast and forecast['daily_avg'] > 50:
-            suggested_price = current_price * 1.05
-            reason = "High demand detected - opportunity for price increase"
-        elif competitor_price > current_price * 1.1:
-            suggested_price = current_price * 1.08
-            reason = "Priced below market - room for margin improvement"
-        else:
-            reason = "Current pricing is optimal"
-        
-        suggestions.append({
-            'product': product,
-            'current_price': round(current_price, 2),
-            'competitor_price': round(competitor_price, 2),
-            'suggested_price': round(suggested_price, 2),
-            'potential_change': round(((suggested_price - current_price) / current_price * 100), 2),
-            'reason': reason
-        })
-    
-    return {'suggestions': suggestions}
+def pricing_forecast_products(products=None, limit=None, cursor=None):
+    """Products whose forecast a pricing page needs (None: all)"""
+    return pricing_page(products, limit, cursor)[2]
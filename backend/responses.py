@@ -0,0 +1,124 @@
+import os
+import gzip
+import json
+import numpy as np
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv('MARKETMIND_COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/x-ndjson')
+
+def _json_default(value):
+    """Convert NumPy/pandas scalars and arrays that the stdlib encoder rejects"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content):
+    """Serialize to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_json_default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that encodes NumPy-backed results directly, skipping jsonable_encoder"""
+
+    def render(self, content):
+        return dumps(content)
+
+def choose_encoding(accept_encoding):
+    """Pick the best supported content coding from an Accept-Encoding header"""
+    offered = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            offered[coding.lower()] = quality
+    for coding in (['br'] if brotli is not None else []) + ['gzip']:
+        if offered.get(coding, offered.get('*', 0)) > 0:
+            return coding
+    return None
+
+def compress(body, coding):
+    if coding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+class CompressionMiddleware:
+    """Negotiate brotli/gzip for complete responses above a size threshold.
+
+    Streaming responses pass through untouched so events are not delayed.
+    A strong ETag on a compressed body is made weak, since the encoded
+    bytes differ from the identity representation it was computed for.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        coding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            headers = MutableHeaders(raw=start_message['headers'])
+            compressible = (
+                not message.get('more_body', False)
+                and len(body) >= self.minimum_size
+                and 'content-encoding' not in headers
+                and headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES)
+            )
+            if compressible:
+                body = compress(body, coding)
+                headers['content-encoding'] = coding
+                headers['content-length'] = str(len(body))
+                etag = headers.get('etag')
+                if etag is not None and not etag.startswith('W/'):
+                    headers['etag'] = 'W/' + etag
+                if 'accept-encoding' not in headers.get('vary', '').lower():
+                    headers.add_vary_header('Accept-Encoding')
+                message = dict(message, body=body)
+            else:
+                passthrough = True
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,220 @@
+"""Background precomputation of the default endpoint results.
+
+With MARKETMIND_PRECOMPUTE=1, the app lifespan starts a scheduler that
+recomputes /forecast, /stock-alerts, /sentiment and /pricing-suggestions
+every MARKETMIND_PRECOMPUTE_INTERVAL seconds, or sooner when one of their
+input files changes. Results are stored as versioned JSON bodies in
+SQLite, so unfiltered requests are answered from the latest stored body
+(with an ETag) instead of being computed in the handler.
+"""
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from backend.data_store import CACHE_DIR, dataset_version
+from backend.executors import run_cpu, run_io
+from backend.sentiment import analyze_sentiment
+from backend.shards import demand_forecast, stock_alerts, pricing_suggestions
+from backend.responses import dumps
+from backend.tracing import record_cache
+
+PRECOMPUTE_ENABLED = os.getenv('MARKETMIND_PRECOMPUTE', '0') == '1'
+PRECOMPUTE_INTERVAL = float(os.getenv('MARKETMIND_PRECOMPUTE_INTERVAL', '300'))
+# How often input files are checked for changes
+PRECOMPUTE_POLL = float(os.getenv('MARKETMIND_PRECOMPUTE_POLL', '5'))
+RESULT_HISTORY = int(os.getenv('MARKETMIND_RESULT_HISTORY', '5'))
+RESULTS_PATH = os.path.join(CACHE_DIR, 'results.sqlite')
+
+async def compute_forecast():
+    return await demand_forecast()
+
+async def compute_stock_alerts():
+    return await stock_alerts()
+
+async def compute_sentiment():
+    return await run_cpu(analyze_sentiment)
+
+async def compute_pricing_suggestions():
+    return await pricing_suggestions()
+
+# Result name -> (datasets it is derived from, coroutine computing it)
+JOBS = {
+    'forecast': (['sales'], compute_forecast),
+    'stock_alerts': (['sales', 'inventory'], compute_stock_alerts),
+    'sentiment': (['reviews'], compute_sentiment),
+    'pricing_suggestions': (['sales', 'pricing'], compute_pricing_suggestions)
+}
+
+def current_data_version(name):
+    """Signature of a job's input files, or None while one of them is missing"""
+    try:
+        return repr(dataset_version(JOBS[name][0]))
+    except FileNotFoundError:
+        return None
+
+class ResultStore:
+    """Versioned result bodies in SQLite, keeping the last RESULT_HISTORY versions per result.
+
+    A new version is only written when the body changes; otherwise the
+    existing version is marked as recomputed. The latest entry per result
+    is also kept in memory, so serving never touches the database.
+    """
+
+    def __init__(self, path=RESULTS_PATH, history=RESULT_HISTORY):
+        self.path = path
+        self.history = history
+        self._latest = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("""CREATE TABLE IF NOT EXISTS results (
+            name TEXT, version INTEGER, etag TEXT, data_version TEXT, computed_at REAL, body BLOB,
+            PRIMARY KEY (name, version))""")
+        return conn
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute("""SELECT name, version, etag, data_version, computed_at, body FROM results r
+                WHERE version = (SELECT MAX(version) FROM results WHERE name = r.name)""").fetchall()
+        finally:
+            conn.close()
+        for name, version, etag, data_version, computed_at, body in rows:
+            self._latest[name] = {'version': version, 'etag': etag, 'data_version': data_version,
+                                  'computed_at': computed_at, 'body': bytes(body)}
+        self._loaded = True
+
+    def latest(self, name):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            return self._latest.get(name)
+
+    def save(self, name, body, data_version):
+        """Store a freshly computed body, returning the resulting latest entry"""
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        now = time.time()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            previous = self._latest.get(name)
+            conn = self._connect()
+            try:
+                with conn:
+                    if previous is not None and previous['etag'] == etag:
+                        version = previous['version']
+                        conn.execute("UPDATE results SET data_version = ?, computed_at = ? WHERE name = ? AND version = ?",
+                                     (data_version, now, name, version))
+                    else:
+                        version = previous['version'] + 1 if previous is not None else 1
+                        conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                                     (name, version, etag, data_version, now, body))
+                        conn.execute("DELETE FROM results WHERE name = ? AND version <= ?",
+                                     (name, version - self.history))
+            finally:
+                conn.close()
+            entry = {'version': version, 'etag': etag, 'data_version': data_version, 'computed_at': now, 'body': body}
+            self._latest[name] = entry
+            return entry
+
+class Scheduler:
+    """Recomputes each job on an interval or when its input files change.
+
+    At most one computation per job runs at a time: a refresh requested
+    while one is in flight waits for that computation instead of starting
+    another.
+    """
+
+    def __init__(self, store, interval=PRECOMPUTE_INTERVAL, poll=PRECOMPUTE_POLL):
+        self.store = store
+        self.interval = interval
+        self.poll = poll
+        self.status = {name: {'runs': 0, 'failures': 0, 'last_error': None, 'last_seconds': None} for name in JOBS}
+        self._inflight = {}
+
+    async def _compute(self, name):
+        # Read the data version first, so a change during the computation triggers another run
+        data_version = await run_io(current_data_version, name)
+        start = time.perf_counter()
+        try:
+            body = dumps(await JOBS[name][1]())
+        except Exception as e:
+            self.status[name].update(failures=self.status[name]['failures'] + 1, last_error=str(e))
+            raise
+        entry = await run_io(self.store.save, name, body, data_version)
+        self.status[name].update(runs=self.status[name]['runs'] + 1, last_error=None,
+                                 last_seconds=round(time.perf_counter() - start, 3))
+        return entry
+
+    async def refresh(self, name):
+        """Recompute a result, joining the computation already in flight if there is one"""
+        task = self._inflight.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(name))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def get(self, name):
+        """Latest stored result, computing it first if none exists yet"""
+        entry = self.store.latest(name)
+        record_cache('precomputed', hits=int(entry is not None), misses=int(entry is None))
+        if entry is None:
+            entry = await self.refresh(name)
+        return entry
+
+    def _due(self, name, data_version):
+        entry = self.store.latest(name)
+        return (entry is None or entry['data_version'] != data_version
+                or time.time() - entry['computed_at'] >= self.interval)
+
+    async def _refresh_quietly(self, name):
+        try:
+            await self.refresh(name)
+        except Exception:
+            # Keep serving the previous result; the next poll retries
+            pass
+
+    async def run(self):
+        """Scheduler loop, run as a background task for the lifetime of the app"""
+        while True:
+            due = []
+            for name in JOBS:
+                data_version = await run_io(current_data_version, name)
+                if data_version is not None and self._due(name, data_version):
+                    due.append(name)
+            await asyncio.gather(*(self._refresh_quietly(name) for name in due))
+            await asyncio.sleep(self.poll)
+
+    def stats(self):
+        results = {}
+        for name in JOBS:
+            entry = self.store.latest(name)
+            results[name] = dict(self.status[name], refreshing=name in self._inflight,
+                                 version=entry['version'] if entry else None,
+                                 age_seconds=round(time.time() - entry['computed_at'], 1) if entry else None)
+        return {'enabled': PRECOMPUTE_ENABLED, 'interval_seconds': self.interval, 'results': results}
+
+scheduler = Scheduler(ResultStore())
+
+def start_scheduler():
+    """Start the scheduler loop on the running event loop when MARKETMIND_PRECOMPUTE=1"""
+    if not PRECOMPUTE_ENABLED:
+        return None
+    return asyncio.ensure_future(scheduler.run())
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or opaque_tag(etag) in [opaque_tag(tag) for tag in candidates]
+
+def opaque_tag(etag):
+    """An ETag without its weakness indicator"""
+    return etag[2:] if etag.startswith('W/') else etag
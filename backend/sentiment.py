@@ -1,85 +1,377 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import json
+import math
+import random
 import pandas as pd
-from transformers import pipeline
 from collections import Counter
 import re
+from backend import data_store
+from backend.data_store import load_dataset, iter_dataset, file_signature, CACHE_DIR
+from backend.query import paginate
+from backend.tracing import stage, traced, record_cache
+from backend.sentiment_backends import build_pipeline, model_id
+
+SENTIMENT_BATCH_SIZE = int(os.getenv('SENTIMENT_BATCH_SIZE', '32'))
+SENTIMENT_CACHE_PATH = os.path.join(CACHE_DIR, 'sentiment.sqlite')
+# JSON object mapping each issue type to its keywords; defaults to <data dir>/issue_taxonomy.json
+ISSUE_TAXONOMY_PATH = os.getenv('MARKETMIND_ISSUE_TAXONOMY')
+# When reviews.csv has this column, /sentiment adds rolling per-product trends over this window
+REVIEW_DATE_COLUMN = 'date'
+SENTIMENT_TREND_WINDOW = os.getenv('SENTIMENT_TREND_WINDOW', '7D')
+# Reviews are read and scored this many rows at a time
+SENTIMENT_CHUNK_ROWS = int(os.getenv('SENTIMENT_CHUNK_ROWS', '10000'))
+SAMPLE_REVIEWS = 10
+# Fixed so the same reviews.csv always yields the same sample_reviews
+SAMPLE_SEED = 0
+
+# Used when no taxonomy file exists
+DEFAULT_ISSUE_KEYWORDS = {
+    'delivery': ['delivery', 'shipping', 'late', 'delayed'],
+    'packaging': ['packaging', 'damaged', 'broken', 'box'],
+    'quality': ['quality', 'broke', 'stopped working', 'poor', 'terrible'],
+    'price': ['overpriced', 'expensive', 'not worth']
+}
 
 # Initialize sentiment analyzer (cached)
 sentiment_analyzer = None
+_analyzer_lock = threading.Lock()
 
 def get_sentiment_analyzer():
-    """Lazy load sentiment analyzer"""
+    """Lazy load sentiment analyzer on the configured SENTIMENT_BACKEND
+
+    transformers (and torch) are imported here rather than at module level,
+    so processes that never score reviews do not pay for the import.
+    """
     global sentiment_analyzer
     if sentiment_analyzer is None:
-        sentiment_analyzer = pipeline("sentiment-analysis", 
-                                     model="distilbert-base-uncased-finetuned-sst-2-english")
+        with _analyzer_lock:
+            if sentiment_analyzer is None:
+                sentiment_analyzer = build_pipeline()
     return sentiment_analyzer
 
-def load_reviews_data():
-    """Load reviews from CSV"""
-    return pd.read_csv('data/reviews.csv')
-
-def analyze_sentiment():
-    """Analyze customer review sentiment"""
-    df = load_reviews_data()
-    analyzer = get_sentiment_analyzer()
-    
-    results = []
-    for _, row in df.iterrows():
-        sentiment = analyzer(row['review_text'][:512])[0]
-        results.append({
-            'product': row['product'],
-            'review': row['review_text'],
-            'sentiment': sentiment['label'],
-            'confidence': sentiment['score']
-        })
-    
-    # Calculate summary
-    sentiment_counts = Counter([r['sentiment'] for r in results])
-    
-    # Extract common issues
-    negative_reviews = [r['review'].lower() for r in results if r['sentiment'] == 'NEGATIVE']
-    
-    issue_keywords = {
-        'delivery': ['delivery', 'shipping', 'late', 'delayed'],
-        'packaging': ['packaging', 'damaged', 'broken', 'box'],
-        'quality': ['quality', 'broke', 'stopped working', 'poor', 'terrible'],
-        'price': ['overpriced', 'expensive', 'not worth']
-    }
-    
-    issues = []
-    for issue_type, keywords in issue_keywords.items():
-        count = sum(1 for review in negative_reviews 
-                   if any(keyword in review for keyword in keywords))
-        if count > 0:
-            issues.append({
-                'issue': issue_type,
-                'count': count,
-                'percentage': round(count / len(negative_reviews) * 100, 1) if negative_reviews else 0
-            })
-    
-    issues.sort(key=lambda x: x['count'], reverse=True)
-    
-    # Product-wise sentiment
-    product_sentiment = {}
-    for product in df['product'].unique():
-        product_results = [r for r in results if r['product'] == product]
-        positive = sum(1 for r in product_results if r['sentiment'] == 'POSITIVE')
-        negative = sum(1 for r in product_results if r['sentiment'] == 'NEGATIVE')
-        
-        product_sentiment[product] = {
-            'positive': positive,
-            'negative': negative,
-            'total': len(product_results),
-            'positive_rate': round(positive / len(product_results) * 100, 1) if product_results else 0
+def load_reviews_data(products=None):
+    """Load reviews from CSV (cached until the file changes)"""
+    return load_dataset('reviews', products=products)
+
+def review_cache_key(text, model=None):
+    """Stable cache key for a review text scored by a given model (and backend)"""
+    model = model or model_id()
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+def _open_score_cache():
+    os.makedirs(os.path.dirname(SENTIMENT_CACHE_PATH) or '.', exist_ok=True)
+    conn = sqlite3.connect(SENTIMENT_CACHE_PATH, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, label TEXT, score REAL)")
+    return conn
+
+def _cached_scores(conn, keys, chunk_size=500):
+    found = {}
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(f"SELECT key, label, score FROM scores WHERE key IN ({placeholders})", chunk)
+        for key, label, score in rows:
+            found[key] = {'label': label, 'score': score}
+    return found
+
+def score_reviews(texts, batch_size=None):
+    """Score review texts, running the model only on texts not cached yet.
+
+    Duplicate texts are scored once. Uncached texts are sorted by length
+    before batching so each batch pads to a similar length.
+    """
+    batch_size = batch_size or SENTIMENT_BATCH_SIZE
+    keys = [review_cache_key(text) for text in texts]
+    unique = dict(zip(keys, texts))
+
+    conn = _open_score_cache()
+    try:
+        scores = _cached_scores(conn, list(unique))
+        pending = sorted((key for key in unique if key not in scores), key=lambda k: len(unique[k]))
+        record_cache('sentiment_scores', hits=len(unique) - len(pending), misses=len(pending))
+
+        if pending:
+            with stage('sentiment_model_load'):
+                analyzer = get_sentiment_analyzer()
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                with stage('sentiment_inference'):
+                    outputs = analyzer([unique[key] for key in batch], batch_size=batch_size, truncation=True)
+                for key, output in zip(batch, outputs):
+                    scores[key] = {'label': output['label'], 'score': float(output['score'])}
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO scores (key, label, score) VALUES (?, ?, ?)",
+                                     [(key, scores[key]['label'], scores[key]['score']) for key in batch])
+    finally:
+        conn.close()
+
+    return [scores[key] for key in keys]
+
+class IssueMatcher:
+    """All issue keywords compiled into a single regex, scanned once per review.
+
+    The pattern is a zero-width lookahead over the keywords, longest first,
+    so it reports the longest keyword starting at every position. Keywords
+    that are prefixes of a match are credited as well, which gives the same
+    result as testing every keyword as a substring on its own.
+    """
+
+    def __init__(self, taxonomy):
+        self.issue_types = list(taxonomy)
+        issues_by_keyword = {}
+        for issue_type, keywords in taxonomy.items():
+            for keyword in keywords:
+                issues_by_keyword.setdefault(keyword.lower(), set()).add(issue_type)
+        keywords = sorted(issues_by_keyword, key=len, reverse=True)
+        self.pattern = re.compile('(?=(' + '|'.join(map(re.escape, keywords)) + '))') if keywords else None
+        self.issues_by_match = {
+            match: sorted({issue for keyword in keywords if match.startswith(keyword)
+                           for issue in issues_by_keyword[keyword]})
+            for match in keywords
         }
-    
+
+    def count_issues(self, reviews):
+        """Number of reviews mentioning each issue type, for a Series of lowercased reviews"""
+        if self.pattern is None or reviews.empty:
+            return {}
+        matches = reviews.str.findall(self.pattern).explode().dropna()
+        issues = matches.map(self.issues_by_match).explode()
+        # A review counts once per issue type, however many of its keywords it contains
+        hits = issues.groupby(level=0).unique().explode()
+        return hits.value_counts().to_dict()
+
+def taxonomy_path():
+    return ISSUE_TAXONOMY_PATH or os.path.join(data_store.DATA_DIR, 'issue_taxonomy.json')
+
+def load_issue_taxonomy(path):
+    """Read a {issue_type: [keyword, ...]} JSON file"""
+    with open(path) as f:
+        taxonomy = json.load(f)
+    if not isinstance(taxonomy, dict) or not all(
+            isinstance(keywords, list) and all(isinstance(k, str) and k for k in keywords)
+            for keywords in taxonomy.values()):
+        raise ValueError(f"{path} must map each issue type to a list of non-empty keyword strings")
+    return taxonomy
+
+_issue_matcher = (None, None)
+_matcher_lock = threading.Lock()
+
+def get_issue_matcher():
+    """Compiled matcher for the current taxonomy, rebuilt when the file changes"""
+    global _issue_matcher
+    path = taxonomy_path()
+    signature = (path, file_signature(path)) if os.path.exists(path) else None
+    with _matcher_lock:
+        if _issue_matcher[1] is None or _issue_matcher[0] != signature:
+            taxonomy = load_issue_taxonomy(path) if signature else DEFAULT_ISSUE_KEYWORDS
+            _issue_matcher = (signature, IssueMatcher(taxonomy))
+        return _issue_matcher[1]
+
+def review_results(chunk, scores):
+    """Columnar results for a chunk of reviews and their scores"""
+    results = pd.DataFrame({
+        'product': chunk['product'].astype(object),
+        'review': chunk['review_text'],
+        'sentiment': [sentiment['label'] for sentiment in scores],
+        'confidence': [sentiment['score'] for sentiment in scores]
+    })
+    if REVIEW_DATE_COLUMN in chunk.columns:
+        results['date'] = pd.to_datetime(chunk[REVIEW_DATE_COLUMN], errors='coerce')
+    return results
+
+def product_sentiment_counts(results):
+    """Positive, negative and total reviews per product, in one groupby"""
+    return pd.DataFrame({
+        'product': results['product'],
+        'positive': results['sentiment'] == 'POSITIVE',
+        'negative': results['sentiment'] == 'NEGATIVE'
+    }).groupby('product', sort=False).agg(
+        positive=('positive', 'sum'), negative=('negative', 'sum'), total=('positive', 'size'))
+
+def product_sentiment_summary(counts):
     return {
-        'overall_sentiment': {
-            'positive': sentiment_counts.get('POSITIVE', 0),
-            'negative': sentiment_counts.get('NEGATIVE', 0),
-            'total_reviews': len(results)
-        },
-        'top_issues': issues[:5],
-        'product_sentiment': product_sentiment,
-        'sample_reviews': results[:10]
+        product: {
+            'positive': int(positive),
+            'negative': int(negative),
+            'total': int(total),
+            'positive_rate': round(positive / total * 100, 1) if total else 0
+        }
+        for product, positive, negative, total in zip(
+            counts.index, counts['positive'], counts['negative'], counts['total'])
     }
+
+def daily_sentiment_counts(results):
+    """Positive and total reviews per product and day"""
+    dated = results.dropna(subset=['date'])
+    return pd.DataFrame({
+        'product': dated['product'],
+        'day': dated['date'].dt.floor('D'),
+        'positive': (dated['sentiment'] == 'POSITIVE').astype('int64'),
+        'reviews': 1
+    }).groupby(['product', 'day'])[['positive', 'reviews']].sum()
+
+def sentiment_trends(daily, window=None):
+    """Rolling positive rate per product over a time window, one point per day with reviews"""
+    window = window or SENTIMENT_TREND_WINDOW
+    if daily is None or daily.empty:
+        return {}
+    rolling = (daily.sort_index().reset_index('product')
+               .groupby('product', sort=False)[['positive', 'reviews']]
+               .rolling(window).sum())
+    trends = {}
+    for (product, day), positive, reviews in zip(rolling.index, rolling['positive'], rolling['reviews']):
+        trends.setdefault(str(product), []).append({
+            'date': day.strftime('%Y-%m-%d'),
+            'reviews': int(reviews),
+            'positive_rate': round(positive / reviews * 100, 1)
+        })
+    return trends
+
+def _fold(total, counts):
+    """Add a chunk's grouped counts into the running totals"""
+    if total is None:
+        return counts
+    return pd.concat([total, counts]).groupby(level=list(range(counts.index.nlevels)), sort=False).sum()
+
+class ReviewReservoir:
+    """Uniform random sample of at most `size` items from a stream of unknown length.
+
+    Uses Algorithm L: after the first `size` items, random draws are only
+    made for the items that get picked, so skipping a chunk costs nothing.
+    Picks depend only on the seed and each item's position in the stream,
+    never on how the stream was split into chunks.
+    """
+
+    def __init__(self, size, seed=SAMPLE_SEED):
+        self.size = size
+        self.seen = 0
+        self._random = random.Random(seed)
+        self._weight = 1.0
+        self._next = None
+        if size > 0:
+            self._next = size - 1
+            self._skip()
+
+    def _uniform(self):
+        return self._random.random() or 5e-324
+
+    def _skip(self):
+        self._weight *= math.exp(math.log(self._uniform()) / self.size)
+        self._next += int(math.log(self._uniform()) / math.log(1.0 - self._weight)) + 1
+
+    def offer(self, count):
+        """Picks among the next `count` stream items, as (offset among them, slot) pairs in order"""
+        start, end = self.seen, self.seen + count
+        self.seen = end
+        picks = [(position - start, position) for position in range(start, min(end, self.size))]
+        while self._next is not None and self._next < end:
+            picks.append((self._next - start, self._random.randrange(self.size)))
+            self._skip()
+        return picks
+
+class SentimentAccumulator:
+    """Running aggregates over scored review chunks.
+
+    Memory is bounded by the number of products (and review days), not by
+    the number of reviews: each chunk is folded in and then dropped.
+    sample_reviews is a seeded reservoir of sample_size reviews drawn
+    uniformly from every review seen.
+    """
+
+    def __init__(self, matcher, sample_size=SAMPLE_REVIEWS, seed=SAMPLE_SEED):
+        self.matcher = matcher
+        self.sample_size = sample_size
+        self.reservoir = ReviewReservoir(sample_size, seed)
+        self.sentiment_counts = Counter()
+        self.issue_counts = Counter()
+        self.negative_reviews = 0
+        self.total_reviews = 0
+        self.product_counts = None
+        self.daily_counts = None
+        self.samples = []
+
+    def add(self, results):
+        self.total_reviews += len(results)
+        self.sentiment_counts.update(results['sentiment'].value_counts().to_dict())
+
+        negative = results.loc[results['sentiment'] == 'NEGATIVE', 'review'].astype(object).str.lower()
+        self.negative_reviews += len(negative)
+        with stage('issue_matching'):
+            self.issue_counts.update(self.matcher.count_issues(negative))
+
+        self.product_counts = _fold(self.product_counts, product_sentiment_counts(results))
+        if 'date' in results.columns:
+            self.daily_counts = _fold(self.daily_counts, daily_sentiment_counts(results))
+
+        picks = self.reservoir.offer(len(results))
+        if picks:
+            offsets = [offset for offset, _ in picks]
+            records = results[['product', 'review', 'sentiment', 'confidence']].iloc[offsets].to_dict('records')
+            for (_, slot), record in zip(picks, records):
+                if slot == len(self.samples):
+                    self.samples.append(record)
+                else:
+                    self.samples[slot] = record
+
+    def summary(self):
+        issues = [
+            {
+                'issue': issue_type,
+                'count': int(self.issue_counts[issue_type]),
+                'percentage': round(self.issue_counts[issue_type] / self.negative_reviews * 100, 1)
+            }
+            for issue_type in self.matcher.issue_types
+            if self.issue_counts.get(issue_type, 0) > 0
+        ]
+        issues.sort(key=lambda x: x['count'], reverse=True)
+
+        result = {
+            'overall_sentiment': {
+                'positive': int(self.sentiment_counts.get('POSITIVE', 0)),
+                'negative': int(self.sentiment_counts.get('NEGATIVE', 0)),
+                'total_reviews': self.total_reviews
+            },
+            'top_issues': issues[:5],
+            'product_sentiment': product_sentiment_summary(self.product_counts) if self.product_counts is not None else {},
+            'sample_reviews': self.samples
+        }
+        if self.daily_counts is not None:
+            result['sentiment_trends'] = sentiment_trends(self.daily_counts)
+        return result
+
+def iter_reviews(products=None, columns=None):
+    """Yield reviews in chunks of SENTIMENT_CHUNK_ROWS rows"""
+    return iter_dataset('reviews', SENTIMENT_CHUNK_ROWS, columns=columns, products=products)
+
+def review_products(products=None):
+    """Products that have reviews, in order of first appearance"""
+    catalog = {}
+    for chunk in iter_reviews(products, columns=['product']):
+        catalog.update(dict.fromkeys(chunk['product'].astype(object).unique().tolist()))
+    return list(catalog)
+
+@traced('sentiment')
+def analyze_sentiment(products=None, limit=None, cursor=None):
+    """Analyze customer review sentiment
+
+    Filtering and pagination select products before any review is scored.
+    Reviews are read, scored and aggregated chunk by chunk, so peak memory
+    does not grow with the size of reviews.csv.
+    """
+    paged = limit is not None or bool(cursor)
+    next_cursor = None
+    if paged:
+        products, next_cursor = paginate(review_products(products), limit, cursor)
+
+    accumulator = SentimentAccumulator(get_issue_matcher())
+    for chunk in iter_reviews(products):
+        scores = score_reviews([review[:512] for review in chunk['review_text'].tolist()])
+        accumulator.add(review_results(chunk, scores))
+
+    result = accumulator.summary()
+    if paged:
+        result['next_cursor'] = next_cursor
+    return result
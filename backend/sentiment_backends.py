@@ -0,0 +1,119 @@
+"""CPU inference backends for the sentiment model, plus a parity check.
+
+    python -m backend.sentiment_backends parity --backend int8
+"""
+import os
+import time
+import argparse
+
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+SENTIMENT_BACKEND = os.getenv('SENTIMENT_BACKEND', 'pytorch')  # 'pytorch', 'int8' or 'onnx'
+SENTIMENT_THREADS = int(os.getenv('SENTIMENT_THREADS', '0'))  # 0 keeps the library default
+BACKENDS = ('pytorch', 'int8', 'onnx')
+
+def model_id(backend=None):
+    """Identifier of the scoring model, used in result cache keys"""
+    backend = backend or SENTIMENT_BACKEND
+    return SENTIMENT_MODEL if backend == 'pytorch' else f"{SENTIMENT_MODEL}@{backend}"
+
+def _onnx_export_dir():
+    from backend.data_store import CACHE_DIR
+    return os.path.join(CACHE_DIR, 'onnx', SENTIMENT_MODEL)
+
+def build_pipeline(backend=None, threads=None):
+    """Build a sentiment-analysis pipeline on the requested backend.
+
+    pytorch: the fp32 model as published.
+    int8: dynamic int8 quantization of the model's Linear layers.
+    onnx: ONNX Runtime session, exported once and reused from the cache dir.
+    """
+    backend = backend or SENTIMENT_BACKEND
+    threads = SENTIMENT_THREADS if threads is None else threads
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+
+    from transformers import pipeline
+
+    if backend == 'onnx':
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        from transformers import AutoTokenizer
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        export_dir = _onnx_export_dir()
+        if os.path.exists(os.path.join(export_dir, 'model.onnx')):
+            model = ORTModelForSequenceClassification.from_pretrained(export_dir, session_options=session_options)
+        else:
+            model = ORTModelForSequenceClassification.from_pretrained(
+                SENTIMENT_MODEL, export=True, session_options=session_options)
+            model.save_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL)
+        return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    if backend == 'pytorch':
+        return pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    model = AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL)
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+def _score(analyzer, texts, batch_size):
+    start = time.perf_counter()
+    outputs = analyzer(texts, batch_size=batch_size, truncation=True)
+    return [output['label'] for output in outputs], time.perf_counter() - start
+
+def check_parity(texts, backend, batch_size=32, threads=None):
+    """Compare a backend's labels and throughput against the fp32 pipeline"""
+    reference = build_pipeline('pytorch', threads)
+    candidate = build_pipeline(backend, threads)
+    # Warm both up so one-off initialization does not skew throughput
+    _score(reference, texts[:batch_size], batch_size)
+    _score(candidate, texts[:batch_size], batch_size)
+
+    reference_labels, reference_seconds = _score(reference, texts, batch_size)
+    candidate_labels, candidate_seconds = _score(candidate, texts, batch_size)
+    disagreements = [
+        {'review': text, 'fp32': expected, backend: actual}
+        for text, expected, actual in zip(texts, reference_labels, candidate_labels)
+        if expected != actual
+    ]
+    return {
+        'backend': backend,
+        'reviews': len(texts),
+        'label_agreement': round(1 - len(disagreements) / len(texts), 4) if texts else 1.0,
+        'fp32_reviews_per_s': round(len(texts) / reference_seconds, 1) if reference_seconds else None,
+        'backend_reviews_per_s': round(len(texts) / candidate_seconds, 1) if candidate_seconds else None,
+        'disagreements': disagreements[:10]
+    }
+
+def main(argv=None):
+    import json
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Sentiment inference backend tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    parity = subparsers.add_parser('parity', help="Measure label agreement with the fp32 pipeline")
+    parity.add_argument('--backend', default='int8', help=f"One of: {', '.join(BACKENDS[1:])}")
+    parity.add_argument('--file', default=os.path.join('data', 'reviews.csv'), help="CSV with a review_text column")
+    parity.add_argument('--limit', type=int, help="Only use the first N reviews")
+    parity.add_argument('--batch-size', type=int, default=32)
+    parity.add_argument('--threads', type=int, default=None)
+    parity.add_argument('--min-agreement', type=float, default=0.98)
+    args = parser.parse_args(argv)
+
+    texts = [text[:512] for text in pd.read_csv(args.file)['review_text'].astype(str)]
+    if args.limit:
+        texts = texts[:args.limit]
+    report = check_parity(texts, args.backend, args.batch_size, args.threads)
+    print(json.dumps(report, indent=2))
+    return 0 if report['label_agreement'] >= args.min_agreement else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+"""Per-store shards of the sales and inventory datasets.
+
+Split flat files that carry a store_id column into one directory per store
+(data/stores/<store_id>/sales.csv, inventory.csv) with:
+
+    python -m backend.shards partition
+
+Once shards exist, store-scoped queries read only their store's files and
+unscoped queries are rolled up chain-wide, with each store's shard
+processed in its own CPU worker. The synchronous get_* functions also
+handle sharded data, but loop over the stores in a single process; async
+callers should use the entry points here instead.
+"""
+import argparse
+import asyncio
+import os
+import pandas as pd
+from backend.data_store import DATASETS, csv_path, store_dir, list_stores
+from backend.executors import run_cpu
+from backend.forecasting import (
+    get_demand_forecast, get_product_forecast_summary, select_products, forecast_products,
+    merge_demand_forecasts, merge_forecast_summaries
+)
+from backend.recommendations import (
+    get_stock_alerts, get_pricing_suggestions, pricing_forecast_products, store_stock_alerts,
+    merge_stock_alerts, format_stock_alerts, validate_risk_levels
+)
+from backend.simulation import simulate_policies, expand_scenarios, store_stock_positions
+from backend.query import QueryError
+
+STORE_COLUMN = 'store_id'
+SHARDED_DATASETS = [name for name, spec in DATASETS.items() if spec.get('sharded')]
+
+def check_store(store):
+    """Reject a store id that has no shard on disk"""
+    if store is not None and store not in list_stores():
+        raise QueryError(f"Unknown store: {store}")
+
+def partition_dataset(name, source=None):
+    """Split a flat dataset with a store_id column into per-store CSV shards"""
+    source = source or csv_path(name)
+    df = pd.read_csv(source, dtype={STORE_COLUMN: str})
+    if STORE_COLUMN not in df.columns:
+        raise ValueError(f"{source} has no {STORE_COLUMN} column to partition by")
+
+    written = []
+    for store, rows in df.groupby(STORE_COLUMN, sort=True):
+        os.makedirs(store_dir(store), exist_ok=True)
+        path = csv_path(name, store)
+        rows.drop(columns=STORE_COLUMN).to_csv(path, index=False)
+        written.append((store, path, len(rows)))
+    return written
+
+async def for_each_store(func, *args):
+    """Call func(*args, store) for every store shard, each in its own CPU worker.
+
+    Without shards, func runs once with store=None. Returns the store ids
+    (or [None]) and the results in the same order.
+    """
+    stores = list_stores() or [None]
+    results = await asyncio.gather(*(run_cpu(func, *args, store) for store in stores))
+    return stores, list(results)
+
+async def sharded_demand_forecast(products=None, limit=None, cursor=None):
+    """Chain-level forecast, forecasting every store's shard in parallel CPU workers"""
+    products, next_cursor = await run_cpu(select_products, products, limit, cursor)
+    stores, results = await for_each_store(forecast_products, products)
+    result = merge_demand_forecasts(stores, results)
+    if limit is not None or cursor:
+        result['next_cursor'] = next_cursor
+    return result
+
+async def sharded_stock_alerts(products=None, risk_level=None, limit=None, cursor=None):
+    """Chain-level stock alerts, evaluating every store's shard in parallel CPU workers"""
+    validate_risk_levels(risk_level)
+    _, frames = await for_each_store(store_stock_alerts, products, risk_level)
+    return format_stock_alerts(merge_stock_alerts(frames), limit, cursor, chain=True)
+
+async def chain_forecast_summary(products=None):
+    """Chain-wide forecast summary, summarizing every store's shard in parallel CPU workers"""
+    _, summaries = await for_each_store(get_product_forecast_summary, products)
+    return merge_forecast_summaries(summaries)
+
+async def demand_forecast(products=None, limit=None, cursor=None, store=None):
+    """get_demand_forecast, fanned out per store for chain-wide queries over sharded data"""
+    if store is None and list_stores():
+        return await sharded_demand_forecast(products, limit, cursor)
+    return await run_cpu(get_demand_forecast, products, limit, cursor, store)
+
+async def stock_alerts(products=None, risk_level=None, limit=None, cursor=None, store=None):
+    """get_stock_alerts, fanned out per store for chain-wide queries over sharded data"""
+    if store is None and list_stores():
+        return await sharded_stock_alerts(products, risk_level, limit, cursor)
+    return await run_cpu(get_stock_alerts, products, risk_level, limit, cursor, store)
+
+async def pricing_suggestions(products=None, limit=None, cursor=None):
+    """get_pricing_suggestions, with the page's forecast fanned out per store over sharded data"""
+    if not list_stores():
+        return await run_cpu(get_pricing_suggestions, products, limit, cursor)
+    page_products = await run_cpu(pricing_forecast_products, products, limit, cursor)
+    summary = await chain_forecast_summary(page_products)
+    return await run_cpu(get_pricing_suggestions, products, limit, cursor, summary)
+
+async def policy_simulation(grid=None, scenarios=None, products=None):
+    """simulate_policies, with every store's stock positions computed in parallel CPU workers"""
+    expand_scenarios(grid, scenarios)  # reject a bad request before forecasting anything
+    _, positions = await for_each_store(store_stock_positions, products)
+    return await run_cpu(simulate_policies, grid, scenarios, products, positions)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage per-store shards of the retail datasets")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    partition = subparsers.add_parser('partition', help=f"Split flat datasets by their {STORE_COLUMN} column")
+    partition.add_argument('datasets', nargs='*', help=f"Datasets to partition: {', '.join(SHARDED_DATASETS)} (default: all)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'partition':
+        unknown = [name for name in args.datasets if name not in SHARDED_DATASETS]
+        if unknown:
+            parser.error(f"not shardable: {', '.join(unknown)}")
+        for name in args.datasets or SHARDED_DATASETS:
+            written = partition_dataset(name)
+            print(f"{name}: {sum(rows for _, _, rows in written)} rows -> {len(written)} store shards")
+
+if __name__ == '__main__':
+    main()
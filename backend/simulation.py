@@ -0,0 +1,179 @@
+import os
+import math
+import itertools
+import numpy as np
+import pandas as pd
+from backend.forecasting import get_product_forecast_summary, merge_forecast_summaries
+from backend.recommendations import (
+    STOCK_POLICY, PRICING_POLICY, load_inventory_data, load_pricing_data, index_by_product,
+    forecast_summary_frame, apply_stock_policy, apply_pricing_policy
+)
+from backend.data_store import list_stores
+from backend.query import QueryError
+from backend.tracing import traced
+
+MAX_SCENARIOS = int(os.getenv('MARKETMIND_MAX_SCENARIOS', '10000'))
+# Scenario x product cells evaluated per block, bounding peak memory
+SIMULATION_BLOCK_CELLS = int(os.getenv('MARKETMIND_SIMULATION_BLOCK_CELLS', '4000000'))
+# Weekly review cycles the reorder policy is run for
+SIMULATION_CYCLES = int(os.getenv('MARKETMIND_SIMULATION_CYCLES', '4'))
+CYCLE_DAYS = 7
+
+# Simulation-only assumptions:
+# price_elasticity: % change in units sold per % change in price (0 = demand ignores price)
+# lead_time_days: days from placing a reorder to its arrival, within a review cycle
+SIMULATION_DEFAULTS = {'price_elasticity': 0.0, 'lead_time_days': 2.0}
+
+POLICY_PARAMETERS = {**STOCK_POLICY, **PRICING_POLICY, **SIMULATION_DEFAULTS}
+
+def expand_scenarios(grid=None, scenarios=None):
+    """Full policies for the cartesian product of a parameter grid plus any explicit scenarios.
+
+    Parameters left out fall back to the live policy. With neither a grid
+    nor scenarios, the live policy is the only scenario.
+    """
+    grid = grid or {}
+    scenarios = list(scenarios or [])
+    for overrides in [grid] + scenarios:
+        unknown = set(overrides) - set(POLICY_PARAMETERS)
+        if unknown:
+            raise QueryError(f"Unknown policy parameter: {', '.join(sorted(unknown))}. "
+                             f"Expected: {', '.join(POLICY_PARAMETERS)}")
+    if any(not values for values in grid.values()):
+        raise QueryError("Every grid parameter needs at least one value")
+
+    count = math.prod(len(values) for values in grid.values()) if grid else 0
+    if count + len(scenarios) > MAX_SCENARIOS:
+        raise QueryError(f"{count + len(scenarios)} scenarios requested, the limit is {MAX_SCENARIOS}")
+
+    policies = [dict(POLICY_PARAMETERS, **dict(zip(grid, values))) for values in itertools.product(*grid.values())] \
+        if grid else []
+    policies += [dict(POLICY_PARAMETERS, **overrides) for overrides in scenarios]
+    return policies or [dict(POLICY_PARAMETERS)]
+
+def policy_columns(policies):
+    """Each policy parameter as an (scenarios, 1) column, ready to broadcast against products"""
+    return {name: np.array([policy[name] for policy in policies], dtype=float)[:, None] for name in POLICY_PARAMETERS}
+
+def simulate_stock(stock, demand, policy, cycles=SIMULATION_CYCLES):
+    """Run the reorder policy over weekly review cycles at the forecast demand rate.
+
+    Each cycle the policy is applied to the stock on hand and its reorder
+    arrives lead_time_days into the cycle, so stock can run out before it
+    does. Returns the first cycle's risk masks and reorder (what
+    /stock-alerts recommends today) and the units short over all cycles.
+    """
+    lead = np.clip(policy['lead_time_days'], 0, CYCLE_DAYS) / CYCLE_DAYS
+    before_arrival, after_arrival = demand * lead, demand * (1 - lead)
+    on_hand = stock * np.ones_like(lead)
+    short = np.zeros_like(on_hand)
+    for cycle in range(cycles):
+        high, medium, reorder = apply_stock_policy(on_hand, demand, policy)
+        if cycle == 0:
+            first_cycle = high, medium, reorder
+        short += np.maximum(0, before_arrival - on_hand)
+        on_hand = np.maximum(0, on_hand - before_arrival) + reorder
+        short += np.maximum(0, after_arrival - on_hand)
+        on_hand = np.maximum(0, on_hand - after_arrival)
+    return first_cycle + (short,)
+
+def simulate_block(stock_inputs, pricing_inputs, policy):
+    """Per-scenario aggregates for one block of scenarios, as scenario x product array operations"""
+    stock, stock_demand = stock_inputs
+    high, medium, reorder, short = simulate_stock(stock, stock_demand, policy)
+    # Ignore float rounding when deciding whether a product ran out
+    stockouts = short > 1e-6
+
+    current, competitor, daily_avg, units = pricing_inputs
+    conditions, suggested = apply_pricing_policy(current, competitor, daily_avg, policy)
+    suggested = np.round(suggested, 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(current > 0, (suggested - current) / current, 0)
+    new_units = units * np.maximum(0, 1 + policy['price_elasticity'] * change)
+    repriced = conditions[0] | conditions[1] | conditions[2]
+
+    return {
+        'stockout_count': stockouts.sum(axis=1),
+        'units_short': short.sum(axis=1),
+        'high_risk_count': high.sum(axis=1),
+        'medium_risk_count': medium.sum(axis=1),
+        'reorder_units': reorder.sum(axis=1),
+        'repriced_count': repriced.sum(axis=1),
+        'revenue_delta_7d': (suggested * new_units - current * units).sum(axis=1)
+    }
+
+def stock_positions(products=None, store=None, forecast_summary=None):
+    """Inventory joined with forecast demand, for one store or unsharded data"""
+    if forecast_summary is None:
+        forecast_summary = get_product_forecast_summary(products, store)
+    summary = forecast_summary_frame(forecast_summary)
+    return summary.join(index_by_product(load_inventory_data(products, store))[['stock_left']], how='inner')
+
+def store_stock_positions(products=None, store=None):
+    """Forecast summary and stock positions of one store (or unsharded data) from one forecast pass"""
+    forecast_summary = get_product_forecast_summary(products, store)
+    return forecast_summary, stock_positions(products, store, forecast_summary)
+
+@traced('simulation')
+def simulate_policies(grid=None, scenarios=None, products=None, store_positions=None):
+    """Evaluate reorder and pricing policy scenarios over the whole catalog.
+
+    The forecast (once per store when sharded) and datasets are loaded
+    once; every scenario is then evaluated with scenario x product array
+    operations. Stock figures cover the products in both inventory and the
+    forecast, like /stock-alerts; stockouts and units short are over
+    SIMULATION_CYCLES weekly cycles of reorders arriving after the lead
+    time. Pricing figures cover every priced product, like
+    /pricing-suggestions. Revenue deltas are over the 7-day forecast
+    horizon, relative to keeping current prices. With sharded data, each
+    store's stock is checked against that store's demand, and prices
+    against chain-wide demand.
+
+    Pass store_positions, the store_stock_positions results of every store
+    (or of the unsharded data), to reuse positions computed elsewhere,
+    e.g. in parallel workers.
+    """
+    policies = expand_scenarios(grid, scenarios)
+    if store_positions is None:
+        store_positions = [store_stock_positions(products, store) for store in list_stores() or [None]]
+    summaries, positions = zip(*store_positions)
+    inventory = pd.concat(positions)
+    summary = forecast_summary_frame(merge_forecast_summaries(summaries))
+    stock_inputs = (inventory['stock_left'].to_numpy(dtype=float),
+                    inventory['next_7_days_demand'].to_numpy(dtype=float))
+
+    pricing = load_pricing_data(products)
+    forecast = pricing['product'].astype(object).map(summary['daily_avg'])
+    units = pricing['product'].astype(object).map(summary['next_7_days_demand']).fillna(0)
+    pricing_inputs = (pricing['current_price'].to_numpy(dtype=float), pricing['competitor_price'].to_numpy(dtype=float),
+                      forecast.to_numpy(dtype=float), units.to_numpy(dtype=float))
+
+    columns = policy_columns(policies)
+    width = max(len(inventory), len(pricing), 1)
+    block = max(1, SIMULATION_BLOCK_CELLS // width)
+    totals = {}
+    for start in range(0, len(policies), block):
+        policy = {name: values[start:start + block] for name, values in columns.items()}
+        for name, values in simulate_block(stock_inputs, pricing_inputs, policy).items():
+            totals.setdefault(name, []).append(values)
+    totals = {name: np.concatenate(values) for name, values in totals.items()}
+
+    results = []
+    for i, policy in enumerate(policies):
+        results.append({
+            'scenario': i,
+            'policy': policy,
+            'stockout_count': int(totals['stockout_count'][i]),
+            'units_short': int(round(totals['units_short'][i])),
+            'high_risk_count': int(totals['high_risk_count'][i]),
+            'medium_risk_count': int(totals['medium_risk_count'][i]),
+            'reorder_units': int(round(totals['reorder_units'][i])),
+            'repriced_count': int(totals['repriced_count'][i]),
+            'revenue_delta_7d': round(float(totals['revenue_delta_7d'][i]), 2)
+        })
+    return {
+        'scenarios': results,
+        'scenario_count': len(results),
+        'stock_positions': len(inventory),
+        'priced_products': len(pricing)
+    }
@@ -0,0 +1,296 @@
+import os
+import sys
+import time
+import threading
+import functools
+import contextvars
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+PROFILING_ENABLED = os.getenv('MARKETMIND_PROFILING', '0') == '1'
+PROFILE_INTERVAL = float(os.getenv('MARKETMIND_PROFILE_INTERVAL_MS', '5')) / 1000
+PROFILE_HISTORY = int(os.getenv('MARKETMIND_PROFILE_HISTORY', '20'))
+
+_current_trace = contextvars.ContextVar('marketmind_trace', default=None)
+
+class Trace:
+    """Per-request record of stage timings and cache lookups"""
+
+    def __init__(self):
+        self.stages = defaultdict(float)
+        self.caches = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] += seconds
+
+    def add_cache(self, name, hits, misses):
+        with self._lock:
+            self.caches[(name, 'hit')] += hits
+            self.caches[(name, 'miss')] += misses
+
+    def export(self):
+        """Picklable snapshot, used to ship worker-process traces back to the parent"""
+        with self._lock:
+            return {'stages': dict(self.stages), 'caches': dict(self.caches)}
+
+    def merge(self, exported):
+        for name, seconds in exported['stages'].items():
+            self.add_stage(name, seconds)
+        for (name, result), count in exported['caches'].items():
+            self.add_cache(name, count if result == 'hit' else 0, count if result == 'miss' else 0)
+
+    def server_timing(self):
+        """Server-Timing header value with one entry per stage"""
+        with self._lock:
+            return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items())
+
+class Metrics:
+    """Process-wide aggregates exposed in Prometheus text format"""
+
+    def __init__(self):
+        self.stage_sum = defaultdict(float)
+        self.stage_count = defaultdict(int)
+        self.cache_total = defaultdict(int)
+        self.http_sum = defaultdict(float)
+        self.http_count = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def observe_stage(self, name, seconds, count=1):
+        with self._lock:
+            self.stage_sum[name] += seconds
+            self.stage_count[name] += count
+
+    def observe_cache(self, name, hits, misses):
+        with self._lock:
+            self.cache_total[(name, 'hit')] += hits
+            self.cache_total[(name, 'miss')] += misses
+
+    def observe_request(self, path, status, seconds):
+        with self._lock:
+            self.http_sum[(path, status)] += seconds
+            self.http_count[(path, status)] += 1
+
+    def render_prometheus(self):
+        with self._lock:
+            lines = [
+                '# HELP marketmind_stage_seconds Time spent in each processing stage',
+                '# TYPE marketmind_stage_seconds summary'
+            ]
+            for name in sorted(self.stage_sum):
+                lines.append(f'marketmind_stage_seconds_sum{{stage="{name}"}} {self.stage_sum[name]:.6f}')
+                lines.append(f'marketmind_stage_seconds_count{{stage="{name}"}} {self.stage_count[name]}')
+            lines += [
+                '# HELP marketmind_cache_requests_total Cache lookups by cache and result',
+                '# TYPE marketmind_cache_requests_total counter'
+            ]
+            for (name, result), count in sorted(self.cache_total.items()):
+                lines.append(f'marketmind_cache_requests_total{{cache="{name}",result="{result}"}} {count}')
+            lines += [
+                '# HELP marketmind_http_request_seconds HTTP request latency by path and status',
+                '# TYPE marketmind_http_request_seconds summary'
+            ]
+            for (path, status) in sorted(self.http_sum):
+                labels = f'path="{path}",status="{status}"'
+                lines.append(f'marketmind_http_request_seconds_sum{{{labels}}} {self.http_sum[(path, status)]:.6f}')
+                lines.append(f'marketmind_http_request_seconds_count{{{labels}}} {self.http_count[(path, status)]}')
+            return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+@contextmanager
+def stage(name):
+    """Time a block as a named stage of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe_stage(name, seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(name, seconds)
+
+def traced(name):
+    """Decorator form of stage()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_cache(name, hits=0, misses=0):
+    """Count cache hits and misses for the current request and globally"""
+    metrics.observe_cache(name, hits, misses)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_cache(name, hits, misses)
+
+def current_trace():
+    return _current_trace.get()
+
+@contextmanager
+def start_trace():
+    """Collect stages recorded in this context into a fresh Trace"""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+def merge_trace(exported):
+    """Fold a trace exported by a worker process into this process's trace and metrics"""
+    for name, seconds in exported['stages'].items():
+        metrics.observe_stage(name, seconds)
+    for (name, result), count in exported['caches'].items():
+        metrics.observe_cache(name, count if result == 'hit' else 0, count if result == 'miss' else 0)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.merge(exported)
+
+class SamplingProfiler:
+    """Samples thread stacks at a fixed interval.
+
+    Only the threads whose ids are in `threads` are sampled; the set may
+    change while the profiler runs. Produces collapsed stacks
+    ("frame;frame;frame count"), the input format of flamegraph tools.
+    """
+
+    def __init__(self, threads, interval=PROFILE_INTERVAL):
+        self.threads = threads
+        self.interval = interval
+        self.samples = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='marketmind-profiler')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in self.threads:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return dict(self.samples)
+
+_profiles = deque(maxlen=PROFILE_HISTORY)
+_profiles_lock = threading.Lock()
+_profile_ids = iter(range(1, sys.maxsize))
+
+def store_profile(path, samples):
+    """Keep a finished request profile, returning its id"""
+    with _profiles_lock:
+        profile_id = next(_profile_ids)
+        _profiles.append({'id': profile_id, 'path': path, 'samples': samples})
+    return profile_id
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return next((p for p in _profiles if p['id'] == profile_id), None)
+
+def render_collapsed(samples):
+    return '\n'.join(f"{stack} {count}" for stack, count in sorted(samples.items(), key=lambda x: -x[1])) + '\n'
+
+def profiling_requested(headers):
+    return PROFILING_ENABLED and headers.get('x-profile', '').lower() in ('1', 'true', 'yes')
+
+_profile_request = contextvars.ContextVar('marketmind_profile_request', default=None)
+# Ids of the threads currently working for the request being profiled
+_profile_threads = contextvars.ContextVar('marketmind_profile_threads', default=None)
+
+def profile_samples():
+    """Mutable sample dict of the request being profiled, if any"""
+    return _profile_request.get()
+
+@contextmanager
+def profiled_thread():
+    """Sample the current thread as part of the profiled request it is working for, if any"""
+    threads = _profile_threads.get()
+    if threads is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    threads.add(thread_id)
+    try:
+        yield
+    finally:
+        threads.discard(thread_id)
+
+# Metrics label for requests that matched no route
+UNMATCHED_ROUTE = '<unmatched>'
+
+class TracingMiddleware:
+    """Wrap each HTTP request in a Trace and report it via Server-Timing and /metrics.
+
+    With MARKETMIND_PROFILING=1, a request sent with "X-Profile: 1" is also
+    sampled; the response carries an X-Profile-Id header whose collapsed
+    stacks are served at /profiles/{id}. Only the request's own work in the
+    I/O pool threads and CPU workers is sampled: the event loop thread is
+    shared by every request, so its time shows in Server-Timing instead.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        from starlette.datastructures import Headers, MutableHeaders
+        path = scope.get('path', '')
+        profile = profiling_requested(Headers(scope=scope))
+        samples = defaultdict(int) if profile else None
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        with start_trace() as trace:
+            threads = set() if profile else None
+            profile_token = _profile_request.set(samples)
+            threads_token = _profile_threads.set(threads)
+            profiler = SamplingProfiler(threads) if profile else None
+            profile_id = store_profile(path, samples) if profile else None
+
+            async def send_wrapper(message):
+                if message['type'] == 'http.response.start':
+                    status['code'] = message['status']
+                    headers = MutableHeaders(raw=message['headers'])
+                    timing = trace.server_timing()
+                    total = (time.perf_counter() - start) * 1000
+                    headers['server-timing'] = f"{timing}, total;dur={total:.1f}" if timing else f"total;dur={total:.1f}"
+                    if profile_id is not None:
+                        headers['x-profile-id'] = str(profile_id)
+                await send(message)
+
+            try:
+                if profiler is not None:
+                    profiler.__enter__()
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if profiler is not None:
+                    profiler.__exit__(None, None, None)
+                    for stack, count in profiler.collapsed().items():
+                        samples[stack] += count
+                _profile_request.reset(profile_token)
+                _profile_threads.reset(threads_token)
+                # Label by route template to keep metric cardinality bounded; 404s and
+                # other unrouted requests share one label whatever their path
+                route = getattr(scope.get('route'), 'path', UNMATCHED_ROUTE)
+                metrics.observe_request(route, status['code'], time.perf_counter() - start)
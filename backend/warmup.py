@@ -0,0 +1,100 @@
+import os
+import asyncio
+import threading
+import time
+from backend.data_store import DATASETS, load_dataset
+
+WARMUP_ENABLED = os.getenv('MARKETMIND_WARMUP', '0') == '1'
+WARMUP_SENTIMENT = os.getenv('MARKETMIND_WARMUP_SENTIMENT', '1') == '1'
+
+# Warm-up progress reported by /ready
+warmup_state = {
+    'status': 'ready' if not WARMUP_ENABLED else 'pending',
+    'steps': {},
+    'started_at': None,
+    'finished_at': None,
+    'error': None
+}
+_state_lock = threading.Lock()
+
+async def _run_step(name, step):
+    start = time.time()
+    with _state_lock:
+        warmup_state['steps'][name] = {'status': 'running'}
+    try:
+        await step()
+    except Exception as e:
+        with _state_lock:
+            warmup_state['steps'][name] = {'status': 'failed', 'error': str(e)}
+        raise
+    with _state_lock:
+        warmup_state['steps'][name] = {'status': 'done', 'seconds': round(time.time() - start, 3)}
+
+def load_all_datasets():
+    for name, spec in DATASETS.items():
+        if not spec.get('streamed'):
+            load_dataset(name)
+
+def load_sentiment_model():
+    from backend.sentiment import get_sentiment_analyzer
+    get_sentiment_analyzer()
+
+def warm_worker():
+    """Process-pool initializer: load datasets and the model once per worker"""
+    try:
+        load_all_datasets()
+        if WARMUP_SENTIMENT:
+            load_sentiment_model()
+    except Exception:
+        # A cold worker still serves requests, it just pays the first-hit cost
+        pass
+
+def _noop():
+    return os.getpid()
+
+async def start_cpu_workers():
+    """Start every CPU pool worker so their initializers run before traffic arrives"""
+    from backend.executors import run_cpu, CPU_WORKERS
+    await asyncio.gather(*(run_cpu(_noop) for _ in range(CPU_WORKERS)))
+
+async def build_context_snapshot():
+    from backend.context_snapshot import get_context_snapshot
+    await get_context_snapshot()
+
+async def run_warmup():
+    """Start the pool workers and build the copilot snapshot
+
+    Datasets and the sentiment model are loaded by the worker initializer,
+    in the processes that read them; this process serves no analytics
+    itself, so loading them here would only cost memory.
+    """
+    with _state_lock:
+        warmup_state.update(status='warming', started_at=time.time(), error=None)
+    steps = [('cpu_workers', start_cpu_workers),
+             ('context_snapshot', build_context_snapshot)]
+    try:
+        for name, step in steps:
+            await _run_step(name, step)
+    except Exception as e:
+        with _state_lock:
+            warmup_state.update(status='failed', finished_at=time.time(), error=str(e))
+        return
+    with _state_lock:
+        warmup_state.update(status='ready', finished_at=time.time())
+
+def start_warmup():
+    """Run the warm-up as a background task on the running event loop when MARKETMIND_WARMUP=1"""
+    if not WARMUP_ENABLED:
+        return None
+    return asyncio.ensure_future(run_warmup())
+
+def get_readiness():
+    """Copy of the warm-up state.
+
+    Ready once warm-up has finished or is disabled. A failed step still
+    counts as ready: the affected path simply stays cold.
+    """
+    with _state_lock:
+        state = dict(warmup_state, steps=dict(warmup_state['steps']))
+    state['ready'] = state['status'] in ('ready', 'failed')
+    return state
@@ -0,0 +1,197 @@
+"""Benchmark the analytics functions and API endpoints on synthetic data.
+
+    python -m benchmarks.run --skus 1000 --days 365 --reviews 20000 --save baseline
+    python -m benchmarks.run --skus 1000 --days 365 --reviews 20000 --compare benchmarks/baselines/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+
+from benchmarks.synthetic import write_dataset
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+def configure_backend(data_dir, cache_dir):
+    """Point the backend at the synthetic dataset and an isolated cache directory"""
+    os.environ['MARKETMIND_DATA_DIR'] = data_dir
+    os.environ['MARKETMIND_CACHE_DIR'] = cache_dir
+    from backend import data_store
+    data_store.DATA_DIR = data_dir
+    data_store.CACHE_DIR = cache_dir
+    data_store.clear_cache()
+
+def time_calls(func, repeat):
+    """Wall-clock seconds of each call"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def peak_memory_mb(func):
+    """Peak Python heap allocation of one call, in MB"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def measure(func, repeat, items, memory=True):
+    """Time a callable: first (cold) call, then repeated warm calls"""
+    first = time_calls(func, 1)[0]
+    timings = np.array(time_calls(func, repeat))
+    result = {
+        'first_run_ms': round(first * 1000, 3),
+        'p50_ms': round(float(np.percentile(timings, 50)) * 1000, 3),
+        'p99_ms': round(float(np.percentile(timings, 99)) * 1000, 3),
+        'mean_ms': round(float(timings.mean()) * 1000, 3),
+        'throughput_per_s': round(items / float(np.percentile(timings, 50)), 1),
+        'items': items,
+        'runs': repeat
+    }
+    if memory:
+        result['peak_mb'] = round(peak_memory_mb(func), 2)
+    return result
+
+def backend_cases(skus, reviews, include_sentiment):
+    from backend.forecasting import get_demand_forecast
+    from backend.recommendations import get_stock_alerts, get_pricing_suggestions
+
+    cases = [
+        ('get_demand_forecast', get_demand_forecast, skus),
+        ('get_stock_alerts', get_stock_alerts, skus),
+        ('get_pricing_suggestions', get_pricing_suggestions, skus)
+    ]
+    if include_sentiment:
+        try:
+            from backend.sentiment import analyze_sentiment
+            cases.append(('analyze_sentiment', analyze_sentiment, reviews))
+        except ImportError as e:
+            print(f"Skipping analyze_sentiment: {e}")
+    return cases
+
+def endpoint_cases(include_sentiment):
+    """HTTP endpoints exercised in-process through the ASGI test client"""
+    try:
+        from fastapi.testclient import TestClient
+        from backend.main import app
+    except ImportError as e:
+        print(f"Skipping HTTP endpoints: {e}")
+        return None, []
+
+    client = TestClient(app)
+    paths = ['/forecast', '/stock-alerts', '/pricing-suggestions']
+    if include_sentiment:
+        paths.append('/sentiment')
+
+    def request(path):
+        def call():
+            response = client.get(path, headers={'accept-encoding': 'gzip'})
+            response.raise_for_status()
+        return call
+
+    return client, [(f"GET {path}", request(path), 1) for path in paths]
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Print p50 ratios against a baseline and return the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':<32}{'baseline p50':>14}{'current p50':>14}{'ratio':>8}")
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else float('inf')
+        flag = '  REGRESSION' if ratio > threshold else ''
+        print(f"{name:<32}{previous['p50_ms']:>12.2f}ms{current['p50_ms']:>12.2f}ms{ratio:>8.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MarketMind AI on synthetic retail data")
+    parser.add_argument('--skus', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--reviews', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help="Reuse or keep the generated dataset in this directory")
+    parser.add_argument('--no-sentiment', action='store_true', help="Skip transformer-based sentiment")
+    parser.add_argument('--no-http', action='store_true', help="Skip HTTP endpoint benchmarks")
+    parser.add_argument('--save', metavar='NAME', help="Store results as benchmarks/baselines/NAME.json")
+    parser.add_argument('--compare', metavar='PATH', help="Compare against a saved baseline JSON")
+    parser.add_argument('--threshold', type=float, default=1.2, help="p50 ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='marketmind-bench-')
+    data_dir = args.data_dir or os.path.join(workdir, 'data')
+    if not os.path.exists(os.path.join(data_dir, 'sales.csv')):
+        start = time.perf_counter()
+        rows = write_dataset(data_dir, args.skus, args.days, args.reviews, args.seed)
+        print(f"Generated {rows} in {time.perf_counter() - start:.1f}s at {data_dir}")
+    configure_backend(data_dir, os.path.join(workdir, 'cache'))
+
+    results = {}
+    include_sentiment = not args.no_sentiment
+    for name, func, items in backend_cases(args.skus, args.reviews, include_sentiment):
+        results[name] = measure(func, args.repeat, items)
+        print(f"{name:<32} p50 {results[name]['p50_ms']:>10.2f}ms  p99 {results[name]['p99_ms']:>10.2f}ms  "
+              f"{results[name]['throughput_per_s']:>12.1f} items/s  peak {results[name]['peak_mb']:.1f}MB")
+
+    if not args.no_http:
+        client, cases = endpoint_cases(include_sentiment)
+        if client is not None:
+            with client:
+                for name, func, items in cases:
+                    results[name] = measure(func, args.repeat, items, memory=False)
+                    print(f"{name:<32} p50 {results[name]['p50_ms']:>10.2f}ms  p99 {results[name]['p99_ms']:>10.2f}ms")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'skus': args.skus,
+            'days': args.days,
+            'reviews': args.reviews,
+            'repeat': args.repeat,
+            'seed': args.seed
+        },
+        'results': results
+    }
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
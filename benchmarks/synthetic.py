@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pandas as pd
+
+POSITIVE_TEMPLATES = [
+    "Amazing {product}, works perfectly",
+    "Great value and fast processing, highly recommend",
+    "Excellent build quality, very happy with this {product}",
+    "Does exactly what it says, would buy again"
+]
+
+NEGATIVE_TEMPLATES = [
+    "Delivery was delayed by {n} days and the box was damaged",
+    "Stopped working after {n} weeks, poor quality",
+    "Overpriced for what you get, not worth it",
+    "Packaging was broken and shipping took forever",
+    "Terrible experience, the {product} broke on day {n}"
+]
+
+# Sales rows generated and written at a time
+SALES_CHUNK_ROWS = 2_000_000
+
+def product_names(skus):
+    """Synthetic SKU names"""
+    return np.array([f"SKU-{i:07d}" for i in range(skus)], dtype=object)
+
+def iter_sales(skus, days, start='2023-01-01', seed=0, chunk_rows=SALES_CHUNK_ROWS):
+    """Daily sales per SKU with a base level, linear trend, weekly seasonality and noise.
+
+    Rows are ordered by date, then product, like an append-only daily feed.
+    They are yielded in blocks of whole days, at most chunk_rows rows (but
+    at least one day) each, with a categorical product column, so any
+    scale can be generated in bounded memory.
+    """
+    rng = np.random.default_rng(seed)
+    products = product_names(skus)
+    dates = pd.date_range(start, periods=days, freq='D')
+
+    base = rng.gamma(2.0, 20.0, skus)
+    trend = rng.normal(0, 0.05, skus)
+    days_per_chunk = max(1, chunk_rows // max(skus, 1))
+    for first in range(0, days, days_per_chunk):
+        block = dates[first:first + days_per_chunk]
+        weekly = 1 + 0.2 * np.sin(2 * np.pi * block.dayofweek.to_numpy() / 7)
+        level = (base[None, :] + trend[None, :] * np.arange(first, first + len(block))[:, None]) * weekly[:, None]
+        units = rng.poisson(np.clip(level, 0, None)).astype(np.int64)
+        yield pd.DataFrame({
+            'date': np.repeat(block.strftime('%Y-%m-%d').to_numpy(), skus),
+            'product': pd.Categorical.from_codes(np.tile(np.arange(skus), len(block)), categories=products),
+            'units_sold': units.ravel()
+        })
+
+def write_sales(path, skus, days, seed=0, chunk_rows=SALES_CHUNK_ROWS):
+    """Append the sales history to a CSV one block of days at a time, returning the row count"""
+    rows = 0
+    for i, chunk in enumerate(iter_sales(skus, days, seed=seed, chunk_rows=chunk_rows)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(chunk)
+    return rows
+
+def generate_inventory(skus, seed=0):
+    """Stock on hand per SKU"""
+    rng = np.random.default_rng(seed + 1)
+    return pd.DataFrame({'product': product_names(skus), 'stock_left': rng.integers(0, 2000, skus)})
+
+def generate_pricing(skus, seed=0):
+    """Own and competitor prices per SKU"""
+    rng = np.random.default_rng(seed + 2)
+    current = np.round(rng.uniform(5, 1500, skus), 2)
+    competitor = np.round(current * rng.uniform(0.85, 1.2, skus), 2)
+    return pd.DataFrame({'product': product_names(skus), 'current_price': current,
+                         'competitor_price': competitor})
+
+def generate_reviews(skus, reviews, negative_share=0.3, seed=0):
+    """Templated review texts, a share of them mentioning common issues"""
+    rng = np.random.default_rng(seed + 3)
+    products = product_names(skus)[rng.integers(0, skus, reviews)]
+    negative = rng.random(reviews) < negative_share
+    numbers = rng.integers(1, 30, reviews)
+    positive_idx = rng.integers(0, len(POSITIVE_TEMPLATES), reviews)
+    negative_idx = rng.integers(0, len(NEGATIVE_TEMPLATES), reviews)
+
+    texts = [
+        (NEGATIVE_TEMPLATES[n] if is_negative else POSITIVE_TEMPLATES[p]).format(product=product, n=number)
+        for product, is_negative, p, n, number in zip(products, negative, positive_idx, negative_idx, numbers)
+    ]
+    return pd.DataFrame({'product': products, 'review_text': texts})
+
+def write_dataset(directory, skus, days, reviews, seed=0):
+    """Write a full synthetic dataset in the layout the backend loaders expect"""
+    os.makedirs(directory, exist_ok=True)
+    rows = {'sales.csv': write_sales(os.path.join(directory, 'sales.csv'), skus, days, seed=seed)}
+    frames = {
+        'inventory.csv': generate_inventory(skus, seed=seed),
+        'pricing.csv': generate_pricing(skus, seed=seed),
+        'reviews.csv': generate_reviews(skus, reviews, seed=seed)
+    }
+    for filename, frame in frames.items():
+        frame.to_csv(os.path.join(directory, filename), index=False)
+        rows[filename] = len(frame)
+    return rows
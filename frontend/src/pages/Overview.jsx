@@ -55,16 +55,15 @@ export default function Overview() {
   
   const loadData = async () => {
     try {
-      const [forecastRes, inventoryRes, sentimentRes] = await Promise.all([
-        axios.get(`${API_URL}/forecast`),
-        axios.get(`${API_URL}/stock-alerts`),
-        axios.get(`${API_URL}/sentiment`),
-      ])
+      const response = await axios.get(`${API_URL}/dashboard`, {
+        params: { section: 'forecast,stock_alerts,sentiment' },
+      })
+      const { sections } = response.data
       
       setData({
-        forecast: forecastRes.data,
-        inventory: inventoryRes.data,
-        sentiment: sentimentRes.data,
+        forecast: sections.forecast,
+        inventory: sections.stock_alerts,
+        sentiment: sections.sentiment,
       })
     } catch (error) {
       console.error('Error loading data:', error)
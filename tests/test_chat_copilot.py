@@ -0,0 +1,131 @@
+import asyncio
+import time
+import pytest
+from backend import chat_copilot
+from backend.chat_copilot import ResponseCache
+from backend.llm_transport import LLMTransport, StubProvider, TokenBucket, set_transport
+
+class CountingProvider(StubProvider):
+    """Stub provider that counts upstream calls"""
+
+    def __init__(self, latency=0.05):
+        super().__init__(latency=latency, failure_rate=0)
+        self.calls = 0
+
+    async def complete(self, messages, timeout, **params):
+        self.calls += 1
+        return await super().complete(messages, timeout, **params)
+
+    async def stream(self, messages, timeout, **params):
+        self.calls += 1
+        async for chunk in super().stream(messages, timeout, **params):
+            yield chunk
+
+CONTEXT = {
+    'forecast': {'rising_products': [], 'alerts': []},
+    'inventory': {'critical_count': 0, 'warning_count': 0, 'alerts': []},
+    'sentiment': {'overall_sentiment': {'positive': 1, 'negative': 0, 'total_reviews': 1}, 'top_issues': []},
+    'pricing': {'suggestions': []},
+    'snapshot_age_seconds': 0.0,
+    'snapshot_version': 'v1'
+}
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = CountingProvider()
+    set_transport(LLMTransport(provider, bucket=TokenBucket(rate=0)))
+    monkeypatch.setattr(chat_copilot, 'response_cache', ResponseCache())
+
+    async def business_context():
+        return dict(CONTEXT)
+
+    monkeypatch.setattr(chat_copilot, 'get_business_context', business_context)
+    yield provider
+    set_transport(None)
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(ttl=0.05)
+    cache.put('q', 'answer')
+    assert cache.get('q') == 'answer'
+
+    time.sleep(0.1)
+
+    assert cache.get('q') is None
+    assert cache.stats()['entries'] == 0
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    cache.get('a')
+    cache.put('c', 'C')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+
+def test_hit_rate_counts_hits_and_coalesced_callers():
+    cache = ResponseCache()
+    cache.put('a', 'A')
+    cache.get('a')
+    cache.get('b')
+
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'coalesced': 0, 'hit_rate': 0.5}
+
+def test_concurrent_questions_share_one_completion(provider):
+    async def ask_all():
+        return await asyncio.gather(*(chat_copilot.chat_with_copilot("What should I restock?") for _ in range(5)))
+
+    answers = asyncio.run(ask_all())
+
+    assert provider.calls == 1
+    assert len({answer['answer'] for answer in answers}) == 1
+    assert chat_copilot.response_cache.stats()['coalesced'] == 4
+
+async def streamed_answer(question):
+    return ''.join([event['content'] async for event in chat_copilot.stream_copilot(question)
+                    if event['type'] == 'token'])
+
+def test_concurrent_streams_share_one_completion(provider):
+    async def stream_all():
+        return await asyncio.gather(*(streamed_answer("What should I restock?") for _ in range(5)))
+
+    answers = asyncio.run(stream_all())
+
+    assert provider.calls == 1
+    assert len(set(answers)) == 1 and answers[0].startswith('[stub]')
+    assert chat_copilot.response_cache.stats()['coalesced'] == 4
+
+def test_streams_and_plain_requests_share_one_completion(provider):
+    async def ask_both():
+        return await asyncio.gather(streamed_answer("Restock?"), chat_copilot.chat_with_copilot("restock"))
+
+    streamed, plain = asyncio.run(ask_both())
+
+    assert provider.calls == 1
+    assert streamed == plain['answer']
+
+def test_streamed_answer_is_cached(provider):
+    async def ask_twice():
+        first = await streamed_answer("Restock?")
+        return first, await streamed_answer("restock")
+
+    first, second = asyncio.run(ask_twice())
+
+    assert provider.calls == 1
+    assert first == second
+    assert chat_copilot.response_cache.stats()['hits'] == 1
+
+def test_failed_completion_falls_back_for_every_stream(provider):
+    provider.failure_rate = 1
+    set_transport(LLMTransport(provider, bucket=TokenBucket(rate=0), max_retries=0))
+
+    async def events(question):
+        return [event async for event in chat_copilot.stream_copilot(question)]
+
+    async def stream_all():
+        return await asyncio.gather(*(events("Restock?") for _ in range(3)))
+
+    for events in asyncio.run(stream_all()):
+        assert events[-1]['type'] == 'done' and events[-1]['source'] == 'data'
+    assert provider.calls == 1
@@ -0,0 +1,45 @@
+import os
+import pandas as pd
+import pytest
+from backend import data_store
+
+pq = pytest.importorskip('pyarrow.parquet')
+from backend.columnar import convert_to_columnar, read_columnar
+
+SALES_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'sales.csv')
+
+@pytest.fixture
+def parquet_sales(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(data_store, 'STORAGE_BACKEND', 'parquet')
+    data_store.clear_cache()
+    pd.read_csv(SALES_CSV).to_csv(tmp_path / 'sales.csv', index=False)
+    convert_to_columnar(['sales'], row_group_size=8)
+    return tmp_path
+
+def test_reads_return_csv_row_order(parquet_sales):
+    expected = data_store.load_csv(data_store.csv_path('sales'), data_store.DATASETS['sales'])
+    products = ['Monitor 27inch', 'Laptop Pro']
+
+    pd.testing.assert_frame_equal(read_columnar(data_store.columnar_path('sales')), expected, check_categorical=False)
+    pd.testing.assert_frame_equal(
+        read_columnar(data_store.columnar_path('sales'), products=products),
+        expected[expected['product'].isin(products)].reset_index(drop=True), check_categorical=False)
+
+def test_product_filter_can_skip_row_groups(parquet_sales):
+    metadata = pq.ParquetFile(data_store.columnar_path('sales')).metadata
+    product = metadata.schema.to_arrow_schema().get_field_index('product')
+    stats = [metadata.row_group(i).column(product).statistics for i in range(metadata.num_row_groups)]
+
+    matching = [s for s in stats if s.min <= 'Laptop Pro' <= s.max]
+
+    assert len(matching) < len(stats) / 2
+
+def test_stale_parquet_copy_falls_back_to_csv(parquet_sales):
+    assert data_store.dataset_path('sales').endswith('.parquet')
+
+    csv = parquet_sales / 'sales.csv'
+    later = os.stat(data_store.columnar_path('sales')).st_mtime_ns + 10**9
+    os.utime(csv, ns=(later, later))
+
+    assert data_store.dataset_path('sales') == str(csv)
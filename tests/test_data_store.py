@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+import pandas as pd
+from backend import data_store
+
+def write_csv(path, rows):
+    pd.DataFrame({'product': ['A'] * rows, 'units_sold': range(rows)}).to_csv(path, index=False)
+
+def counting_reads(monkeypatch):
+    reads = []
+    real_read = data_store._read_csv
+
+    def read(path, spec):
+        reads.append(path)
+        time.sleep(0.05)  # Keep the reload in flight while the other callers arrive
+        return real_read(path, spec)
+
+    monkeypatch.setattr(data_store, '_read_csv', read)
+    return reads
+
+def load_concurrently(path, callers=8):
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def load():
+        barrier.wait()
+        results.append(data_store.load_csv(str(path)))
+
+    threads = [threading.Thread(target=load) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_changed_file_is_reloaded_exactly_once(tmp_path, monkeypatch):
+    data_store.clear_cache()
+    reads = counting_reads(monkeypatch)
+    path = tmp_path / 'sales.csv'
+    write_csv(path, 3)
+
+    assert all(len(df) == 3 for df in load_concurrently(path))
+    assert len(reads) == 1
+
+    write_csv(path, 5)
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+    assert all(len(df) == 5 for df in load_concurrently(path))
+    assert len(reads) == 2
+
+def test_lock_table_grows_per_file_not_per_query(tmp_path):
+    data_store.clear_cache()
+    path = str(tmp_path / 'sales.csv')
+    write_csv(path, 3)
+    before = len(data_store._path_locks)
+
+    for products in (('A',), ('B',), ('A', 'B')):
+        data_store._load_cached(path, products, lambda: pd.read_csv(path))
+
+    assert len(data_store._path_locks) == before + 1
@@ -0,0 +1,90 @@
+import os
+import pandas as pd
+import pytest
+from backend.data_store import DATASETS
+from backend.forecasting import (
+    simple_moving_average_forecast, compute_product_stats, build_forecasts, IncrementalForecastState
+)
+
+SALES_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'sales.csv')
+
+@pytest.fixture
+def sales():
+    df = pd.read_csv(SALES_CSV)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def row_loop_growth_rates(df):
+    """Growth rates as the original per-product loop computed them"""
+    rates = {}
+    for product in df['product'].unique():
+        product_data = df[df['product'] == product]
+        recent_avg = product_data['units_sold'].tail(7).mean()
+        older_avg = product_data['units_sold'].head(7).mean()
+        rates[product] = ((recent_avg - older_avg) / older_avg * 100) if older_avg > 0 else 0
+    return rates
+
+def test_build_forecasts_matches_row_loop(sales):
+    expected = []
+    for product in sales['product'].unique():
+        expected.extend(simple_moving_average_forecast(sales, product) or [])
+
+    forecasts = build_forecasts(compute_product_stats(sales))
+
+    assert forecasts.to_dict('records') == expected
+
+def test_growth_rates_match_row_loop(sales):
+    stats = compute_product_stats(sales)
+
+    assert dict(zip(stats['product'], stats['growth_rate'])) == pytest.approx(row_loop_growth_rates(sales))
+
+def test_stats_do_not_depend_on_row_order(sales):
+    shuffled = sales.sample(frac=1, random_state=0)
+
+    pd.testing.assert_frame_equal(
+        compute_product_stats(shuffled).set_index('product').loc[sales['product'].unique()],
+        compute_product_stats(sales).set_index('product'))
+
+def test_incremental_updates_match_full_recompute(sales):
+    sales = sales.sort_values('date', kind='stable').reset_index(drop=True)
+    cutoff = sales['date'].min() + pd.Timedelta(days=5)
+    state = IncrementalForecastState()
+    state.update(sales[sales['date'] <= cutoff])
+    for _, day in sales[sales['date'] > cutoff].groupby('date', sort=True):
+        state.update(day)
+
+    pd.testing.assert_frame_equal(state.stats(), compute_product_stats(sales), check_dtype=False)
+
+def test_sync_reads_only_appended_rows(sales, tmp_path, monkeypatch):
+    sales = sales.sort_values('date', kind='stable').reset_index(drop=True)
+    split = len(sales) // 2
+    path = tmp_path / 'sales.csv'
+    sales.iloc[:split].to_csv(path, index=False, date_format='%Y-%m-%d')
+    state = IncrementalForecastState()
+    state.sync(str(path))
+
+    sales.iloc[split:].to_csv(path, mode='a', header=False, index=False, date_format='%Y-%m-%d')
+    monkeypatch.setattr(state, 'rebuild', lambda path: pytest.fail("appended rows triggered a full rebuild"))
+    state.sync(str(path))
+
+    assert state.offset == os.path.getsize(path)
+    full = pd.read_csv(path, dtype=DATASETS['sales']['dtype'], parse_dates=['date'])
+    pd.testing.assert_frame_equal(state.stats(), compute_product_stats(full), check_dtype=False)
+
+def test_out_of_order_rows_are_rejected(sales):
+    state = IncrementalForecastState()
+    state.update(sales)
+
+    with pytest.raises(ValueError):
+        state.update(sales.head(1))
+
+@pytest.mark.parametrize('products', [[], ['Nope']])
+def test_incremental_stats_for_unmatched_products_forecast_nothing(sales, products):
+    state = IncrementalForecastState()
+    state.update(sales)
+
+    stats = state.stats(products)
+
+    pd.testing.assert_frame_equal(stats, compute_product_stats(sales.iloc[0:0]), check_dtype=False)
+    assert stats['last_date'].dtype == 'datetime64[ns]'
+    assert build_forecasts(stats).empty
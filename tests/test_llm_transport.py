@@ -0,0 +1,140 @@
+import asyncio
+import time
+import pytest
+from backend.llm_transport import (CircuitBreaker, LLMTransport, LLMUnavailable, RetryableError, StubProvider,
+                                   TokenBucket)
+
+MESSAGES = [{'role': 'user', 'content': 'How are sales?'}]
+
+class FlakyProvider(StubProvider):
+    """Stub provider whose first `failures` calls fail with a retryable error"""
+
+    def __init__(self, failures, latency=0.0):
+        super().__init__(latency=latency, failure_rate=0)
+        self.failures = failures
+        self.calls = 0
+
+    async def _respond(self, timeout):
+        self.calls += 1
+        await super()._respond(timeout)
+        if self.calls <= self.failures:
+            raise RetryableError("stub provider returned HTTP 503")
+
+def transport(provider, **kwargs):
+    kwargs.setdefault('bucket', TokenBucket(rate=0))
+    kwargs.setdefault('breaker', CircuitBreaker(threshold=5, cooldown=30))
+    kwargs.setdefault('backoff', 0.001)
+    return LLMTransport(provider, **kwargs)
+
+async def collect(chunks):
+    return ''.join([chunk async for chunk in chunks])
+
+def test_retries_then_succeeds():
+    provider = FlakyProvider(failures=2)
+    llm = transport(provider, max_retries=3)
+
+    answer = asyncio.run(llm.complete(MESSAGES))
+
+    assert answer == provider.answer(MESSAGES)
+    assert provider.calls == 3
+    assert llm.counts == {'requests': 1, 'completed': 1, 'retries': 2, 'failed': 0, 'rejected': 0}
+    assert llm.breaker.stats() == {'state': 'closed', 'consecutive_failures': 0, 'trips': 0}
+
+def test_stream_retries_before_first_chunk():
+    provider = FlakyProvider(failures=1)
+    llm = transport(provider)
+
+    assert asyncio.run(collect(llm.stream(MESSAGES))) == provider.answer(MESSAGES)
+    assert provider.calls == 2
+    assert llm.counts['retries'] == 1 and llm.counts['completed'] == 1
+
+def test_gives_up_after_max_retries():
+    provider = FlakyProvider(failures=10)
+    llm = transport(provider, max_retries=2)
+
+    with pytest.raises(LLMUnavailable, match='HTTP 503'):
+        asyncio.run(llm.complete(MESSAGES))
+    assert provider.calls == 3
+    assert llm.counts['failed'] == 1
+
+def test_breaker_opens_and_rejects_without_calling_provider():
+    provider = FlakyProvider(failures=10)
+    llm = transport(provider, breaker=CircuitBreaker(threshold=3, cooldown=30), max_retries=10)
+
+    with pytest.raises(LLMUnavailable, match='HTTP 503'):
+        asyncio.run(llm.complete(MESSAGES))
+    assert provider.calls == 3
+    assert llm.breaker.stats() == {'state': 'open', 'consecutive_failures': 3, 'trips': 1}
+
+    with pytest.raises(LLMUnavailable, match='circuit breaker is open'):
+        asyncio.run(llm.complete(MESSAGES))
+    with pytest.raises(LLMUnavailable, match='circuit breaker is open'):
+        asyncio.run(collect(llm.stream(MESSAGES)))
+    assert provider.calls == 3
+    assert llm.counts['rejected'] == 2
+
+def test_half_open_trial_success_closes_breaker():
+    provider = FlakyProvider(failures=2)
+    llm = transport(provider, breaker=CircuitBreaker(threshold=2, cooldown=0.05), max_retries=0)
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            asyncio.run(llm.complete(MESSAGES))
+    assert llm.breaker.state == 'open'
+
+    time.sleep(0.06)
+    assert llm.breaker.state == 'half_open'
+    assert asyncio.run(llm.complete(MESSAGES)) == provider.answer(MESSAGES)
+    assert llm.breaker.stats() == {'state': 'closed', 'consecutive_failures': 0, 'trips': 1}
+
+def test_half_open_trial_failure_reopens_breaker():
+    provider = FlakyProvider(failures=3)
+    llm = transport(provider, breaker=CircuitBreaker(threshold=2, cooldown=0.05), max_retries=0)
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            asyncio.run(llm.complete(MESSAGES))
+    time.sleep(0.06)
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(llm.complete(MESSAGES))
+    assert llm.breaker.stats() == {'state': 'open', 'consecutive_failures': 3, 'trips': 2}
+
+def test_deadline_exceeded_raises_unavailable():
+    provider = FlakyProvider(failures=0, latency=1.0)
+    llm = transport(provider, deadline=0.05)
+
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(llm.complete(MESSAGES))
+    assert time.monotonic() - start < 0.5
+    assert llm.counts['completed'] == 0 and llm.counts['failed'] == 1
+
+def test_no_retry_past_deadline():
+    provider = FlakyProvider(failures=10)
+    llm = transport(provider, deadline=0.2, backoff=1.0, max_retries=5)
+
+    with pytest.raises(LLMUnavailable, match='HTTP 503'):
+        asyncio.run(llm.complete(MESSAGES))
+    assert provider.calls == 1
+    assert llm.counts['retries'] == 0
+
+def test_token_bucket_rejects_when_wait_exceeds_deadline():
+    bucket = TokenBucket(rate=1, burst=1)
+
+    async def take_two():
+        await bucket.acquire(time.monotonic() + 5)
+        await bucket.acquire(time.monotonic() + 0.1)
+
+    with pytest.raises(LLMUnavailable, match='rate limit'):
+        asyncio.run(take_two())
+
+def test_token_bucket_waits_for_refill_within_deadline():
+    bucket = TokenBucket(rate=50, burst=1)
+
+    async def take_two():
+        await bucket.acquire(time.monotonic() + 5)
+        start = time.monotonic()
+        await bucket.acquire(time.monotonic() + 5)
+        return time.monotonic() - start
+
+    assert 0.01 <= asyncio.run(take_two()) < 0.5
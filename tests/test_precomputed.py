@@ -0,0 +1,75 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.scheduler import ResultStore, Scheduler, etag_matches
+
+# Large enough to be gzip compressed
+BODY = json.dumps({'product_sentiment': {f'Product {i}': {'positive': i, 'total': 2 * i} for i in range(200)}}).encode()
+
+ENCODINGS = ['gzip', 'identity']
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """/sentiment served from a stored precomputed result"""
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    entry = store.save('sentiment', BODY, 'v1')
+    monkeypatch.setattr(main, 'PRECOMPUTE_ENABLED', True)
+    monkeypatch.setattr(main, 'scheduler', Scheduler(store))
+    return TestClient(main.app), entry['etag']
+
+def get(client, encoding, if_none_match=None):
+    headers = {'Accept-Encoding': encoding}
+    if if_none_match is not None:
+        headers['If-None-Match'] = if_none_match
+    return client.get('/sentiment', headers=headers)
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+def test_full_response_has_weak_etag(client, encoding):
+    client, etag = client
+    response = get(client, encoding)
+    assert response.status_code == 200
+    assert response.headers['etag'] == 'W/' + etag
+    assert 'accept-encoding' in response.headers['vary'].lower()
+    assert response.headers.get('content-encoding') == (None if encoding == 'identity' else encoding)
+    assert response.content == BODY
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+@pytest.mark.parametrize('if_none_match', [
+    '{etag}',
+    'W/{etag}',
+    '*',
+    '"other", W/{etag}',
+    'W/"other",{etag} , "another"'
+])
+def test_matching_if_none_match_is_not_modified(client, encoding, if_none_match):
+    client, etag = client
+    response = get(client, encoding, if_none_match.format(etag=etag))
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == 'W/' + etag
+    assert 'accept-encoding' in response.headers['vary'].lower()
+    assert 'content-encoding' not in response.headers
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+@pytest.mark.parametrize('if_none_match', ['"other"', 'W/"other"', '"other", W/"another"', ''])
+def test_other_if_none_match_gets_full_response(client, encoding, if_none_match):
+    client, etag = client
+    response = get(client, encoding, if_none_match)
+    assert response.status_code == 200
+    assert response.headers['etag'] == 'W/' + etag
+    assert response.content == BODY
+
+def test_etag_served_with_gzip_revalidates_identity(client):
+    client, _ = client
+    served = get(client, 'gzip').headers['etag']
+    assert get(client, 'identity', served).status_code == 304
+
+def test_etag_matches_uses_weak_comparison():
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"a"', 'W/"a"')
+    assert etag_matches('"b", W/"a"', '"a"')
+    assert etag_matches('*', '"a"')
+    assert not etag_matches('"ab"', '"a"')
+    assert not etag_matches(None, '"a"')
+    assert not etag_matches('', '"a"')
@@ -0,0 +1,87 @@
+import os
+import pandas as pd
+import pytest
+from backend import data_store, sentiment
+from backend.sentiment import DEFAULT_ISSUE_KEYWORDS, IssueMatcher
+
+REVIEWS_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'reviews.csv')
+
+# Keywords that are prefixes of, contained in, or overlapping with each other, across issue types
+OVERLAPPING_KEYWORDS = {
+    'delivery': ['late', 'latest', 'ship', 'shipping', 'pping'],
+    'packaging': ['box', 'boxed', 'broke', 'broken', 'ken'],
+    'quality': ['broke', 'poor', 'poorly made', 'or'],
+    'price': ['worth', 'not worth', 'overpriced', 'price']
+}
+
+OVERLAPPING_REVIEWS = [
+    "the latest shipping was late",
+    "arrived boxed but broken",
+    "poorly made, not worth the price",
+    "overpriced",
+    "kenny loved it",
+    "shipping, shipping and more shipping",
+    "",
+    "nothing to report",
+    "BROKEN box"
+]
+
+def substring_counts(taxonomy, reviews):
+    """Reviews mentioning each issue type, testing every keyword as a substring"""
+    counts = {}
+    for review in reviews:
+        for issue_type, keywords in taxonomy.items():
+            if any(keyword.lower() in review for keyword in keywords):
+                counts[issue_type] = counts.get(issue_type, 0) + 1
+    return counts
+
+@pytest.mark.parametrize('taxonomy, reviews', [
+    (OVERLAPPING_KEYWORDS, OVERLAPPING_REVIEWS),
+    (DEFAULT_ISSUE_KEYWORDS, OVERLAPPING_REVIEWS),
+    (DEFAULT_ISSUE_KEYWORDS, pd.read_csv(REVIEWS_CSV)['review_text'].tolist())
+])
+def test_issue_matcher_matches_substring_checks(taxonomy, reviews):
+    reviews = pd.Series(reviews, dtype=object).str.lower()
+
+    assert IssueMatcher(taxonomy).count_issues(reviews) == substring_counts(taxonomy, reviews)
+
+def fake_scores(texts):
+    """Deterministic stand-in for the model: reviews mentioning a problem are negative"""
+    negative = ('late', 'broke', 'poor', 'overpriced', 'damaged', 'not worth')
+    return [
+        {'label': 'NEGATIVE' if any(word in text.lower() for word in negative) else 'POSITIVE', 'score': 0.5 + len(text) % 50 / 100}
+        for text in texts
+    ]
+
+@pytest.fixture
+def dated_reviews(tmp_path, monkeypatch):
+    """A dated reviews.csv with more rows than several small chunks"""
+    monkeypatch.setattr(data_store, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(sentiment, 'score_reviews', fake_scores)
+    texts = OVERLAPPING_REVIEWS[:6] + ["works great", "love it", "arrived late and damaged"]
+    pd.DataFrame({
+        'product': [['Laptop Pro', 'Phone X', 'Tablet'][i % 3] for i in range(60)],
+        'review_text': [texts[i * 7 % len(texts)] for i in range(60)],
+        'date': pd.date_range('2024-01-01', periods=60, freq='11h').strftime('%Y-%m-%d %H:%M')
+    }).to_csv(tmp_path / 'reviews.csv', index=False)
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 16])
+def test_chunked_aggregation_matches_whole_file(dated_reviews, monkeypatch, chunk_rows):
+    monkeypatch.setattr(sentiment, 'SENTIMENT_CHUNK_ROWS', 1000)
+    whole = sentiment.analyze_sentiment()
+    monkeypatch.setattr(sentiment, 'SENTIMENT_CHUNK_ROWS', chunk_rows)
+    chunked = sentiment.analyze_sentiment()
+
+    assert whole['overall_sentiment']['total_reviews'] == 60
+    assert whole['sentiment_trends']
+    for key in ('overall_sentiment', 'top_issues', 'product_sentiment', 'sentiment_trends', 'sample_reviews'):
+        assert chunked[key] == whole[key]
+
+def test_sample_reviews_is_a_bounded_reservoir(dated_reviews):
+    first = sentiment.analyze_sentiment()['sample_reviews']
+    assert len(first) == sentiment.SAMPLE_REVIEWS
+    assert sentiment.analyze_sentiment()['sample_reviews'] == first
+
+    # Later reviews are picked too, not just the head of the file
+    picks = [position for position, _ in sentiment.ReviewReservoir(10).offer(60)[10:]]
+    assert picks and all(10 <= position < 60 for position in picks)